@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+banco.py
+Author: Mário (DevOps/SRE)
+Version: 1.1
+Date: 2026-10-19
+
+Schema e migrações de MedidaSolo para bancos criados por versões anteriores.
+- data_hora_ms: timestamp epoch em milissegundos (INTEGER, indexado)
+- vw_MedidaSolo: visão com a coluna texto data_hora (hora local), para compatibilidade
+- AcaoAgricola: recomendações por intervalo de medidas (colunas novas via ALTER TABLE;
+  id_acao AUTOINCREMENT, para que ids de ações apagadas não sejam reutilizados)
+As migrações são idempotentes e baratas quando o banco já está atualizado.
+
+Licença: MIT
+"""
+
+import time
+
+DDL_MEDIDA_SOLO = """
+    CREATE TABLE IF NOT EXISTS MedidaSolo (
+        id_medida INTEGER PRIMARY KEY,
+        data_hora_ms INTEGER,
+        valor_umidade DOUBLE,
+        valor_ph DOUBLE,
+        valor_npk VARCHAR(100),
+        temperatura DOUBLE,
+        previsao_chuva VARCHAR(20),
+        crescimento_percentual DOUBLE,
+        id_dispositivo INTEGER,
+        id_talhao INTEGER,
+        peso DOUBLE NOT NULL DEFAULT 1,
+        FOREIGN KEY (id_dispositivo) REFERENCES DispositivoCampo(id_dispositivo),
+        FOREIGN KEY (id_talhao) REFERENCES TalhaoCacau(id_talhao)
+    );
+"""
+DDL_INDICES = [
+    "CREATE INDEX IF NOT EXISTS idx_medidasolo_data_hora_ms ON MedidaSolo(data_hora_ms)",
+]
+DDL_VISAO = """
+    CREATE VIEW IF NOT EXISTS vw_MedidaSolo AS
+    SELECT m.*,
+           strftime('%Y-%m-%d %H:%M:%S', m.data_hora_ms / 1000.0, 'unixepoch', 'localtime') AS data_hora
+    FROM MedidaSolo m
+"""
+
+# Expressão SQL para a hora local de uma linha de MedidaSolo com alias "m"
+SQL_LOCALTIME = "m.data_hora_ms / 1000.0, 'unixepoch', 'localtime'"
+
+
+def agora_ms():
+    return time.time_ns() // 1_000_000
+
+
+def datetime_para_ms(dt):
+    """datetime local (naive) -> epoch em milissegundos."""
+    return int(round(dt.timestamp() * 1000))
+
+
+def ms_para_datetime(serie):
+    """Converte (vetorizado) uma Series de epoch ms para datetime local sem timezone."""
+    import pandas as pd
+    from dateutil.tz import tzlocal
+    return pd.to_datetime(serie, unit='ms', utc=True).dt.tz_convert(tzlocal()).dt.tz_localize(None)
+
+
+def ddl_medida_solo(tabela="MedidaSolo"):
+    """DDL de MedidaSolo com outro nome (tabela temporária, partição anexada etc.)."""
+    return DDL_MEDIDA_SOLO.replace("MedidaSolo (", f"{tabela} (", 1)
+
+
+def colunas(c, tabela):
+    """Nomes das colunas de uma tabela (vazio se ela não existir)."""
+    return {linha[1] for linha in c.execute(f"PRAGMA table_info({tabela})")}
+
+
+# Colunas de uma leitura no formato antigo (tudo menos id_medida)
+COLUNAS_LEITURA = ["data_hora", "valor_umidade", "valor_ph", "valor_npk", "temperatura", "previsao_chuva",
+                   "crescimento_percentual", "id_dispositivo", "id_talhao"]
+# Regra de reforço do simular_dados.py antigo: leituras assim eram gravadas 3 vezes seguidas
+COPIAS_REFORCO = 3
+SQL_REFORCO = ("valor_umidade < 40.0 AND valor_ph > 5.5 AND valor_ph < 6.5 "
+               "AND valor_npk = 'Fósforo:1,Potássio:1'")
+
+
+def _recria_com_data_hora_ms(c):
+    """
+    Reconstrói MedidaSolo trocando data_hora (texto, hora local) por data_hora_ms.
+    Procedimento padrão do SQLite para alterar colunas: nova tabela, cópia, drop, rename.
+    Bancos sem a coluna peso guardavam as leituras reforçadas repetidas: cada trio de linhas
+    idênticas com ids consecutivos que atende SQL_REFORCO vira uma só (o menor id_medida) com
+    peso 3. Outras linhas idênticas (ex.: leituras reais no mesmo segundo) são mantidas.
+    """
+    conn = c.connection
+    conn.commit()
+    fks = c.execute("PRAGMA foreign_keys").fetchone()[0]
+    c.execute("PRAGMA foreign_keys = OFF")
+    try:
+        c.execute("BEGIN")
+        c.execute("DROP VIEW IF EXISTS vw_MedidaSolo")
+        c.execute(ddl_medida_solo("MedidaSolo_nova"))
+        dados = ", ".join(COLUNAS_LEITURA)
+        if "peso" in colunas(c, "MedidaSolo"):
+            origem = f"SELECT id_medida, {dados}, peso FROM MedidaSolo"
+        else:
+            origem = _origem_sem_copias(dados)
+        # julianday(..., 'utc') interpreta o texto como hora local e preserva frações de segundo
+        c.execute(f"""
+            INSERT INTO MedidaSolo_nova (
+                id_medida, data_hora_ms, valor_umidade, valor_ph, valor_npk,
+                temperatura, previsao_chuva, crescimento_percentual,
+                id_dispositivo, id_talhao, peso
+            )
+            SELECT id_medida,
+                   CAST(round((julianday(data_hora, 'utc') - 2440587.5) * 86400000.0) AS INTEGER),
+                   valor_umidade, valor_ph, valor_npk,
+                   temperatura, previsao_chuva, crescimento_percentual,
+                   id_dispositivo, id_talhao, peso
+            FROM ({origem})
+        """)
+        _remove_copias(c)
+        c.execute("DROP TABLE MedidaSolo")
+        c.execute("ALTER TABLE MedidaSolo_nova RENAME TO MedidaSolo")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        c.execute(f"PRAGMA foreign_keys = {'ON' if fks else 'OFF'}")
+
+
+def _origem_sem_copias(dados):
+    """SELECT de MedidaSolo com cada trio de cópias reforçadas reduzido a uma linha com peso 3."""
+    return f"""
+        WITH numeradas AS (
+            SELECT *, (ROW_NUMBER() OVER (PARTITION BY {dados} ORDER BY id_medida) - 1) / {COPIAS_REFORCO} AS trio,
+                   COALESCE({SQL_REFORCO}, 0) AS reforco
+            FROM MedidaSolo
+        ), trios AS (
+            SELECT *, COUNT(*) OVER t AS n_trio, MAX(id_medida) OVER t - MIN(id_medida) OVER t AS amplitude
+            FROM numeradas
+            WINDOW t AS (PARTITION BY {dados}, trio)
+        )
+        SELECT MIN(id_medida) AS id_medida, {dados}, COUNT(*) AS peso
+        FROM trios
+        GROUP BY {dados}, CASE WHEN reforco AND n_trio = {COPIAS_REFORCO} AND amplitude = {COPIAS_REFORCO - 1}
+                               THEN trio ELSE -id_medida END
+    """
+
+
+def _remove_copias(c):
+    """Aponta as referências das cópias descartadas para a linha mantida e apaga as features órfãs."""
+    if "AcaoAgricola" in _tabelas(c):
+        # As cópias têm ids consecutivos logo após a linha mantida
+        c.execute("""
+            UPDATE OR IGNORE AcaoAgricola SET id_medida = (
+                SELECT MAX(n.id_medida) FROM MedidaSolo_nova n WHERE n.id_medida < AcaoAgricola.id_medida)
+            WHERE id_medida NOT IN (SELECT id_medida FROM MedidaSolo_nova)
+              AND id_medida IN (SELECT id_medida FROM MedidaSolo)
+        """)
+    if "FeatureMedida" in _tabelas(c):
+        c.execute("DELETE FROM FeatureMedida WHERE id_medida NOT IN (SELECT id_medida FROM MedidaSolo_nova)")
+
+
+def _tabelas(c):
+    return {linha[0] for linha in c.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+DDL_ACAO_AGRICOLA = """
+    CREATE TABLE IF NOT EXISTS AcaoAgricola (
+        id_acao INTEGER PRIMARY KEY AUTOINCREMENT,
+        id_medida INTEGER,
+        recomendacao VARCHAR(255),
+        FOREIGN KEY (id_medida) REFERENCES MedidaSolo(id_medida)
+    );
+"""
+DDL_HISTORICO_ACAO = """
+    CREATE TABLE IF NOT EXISTS HistoricoAcao (
+        id_historico INTEGER PRIMARY KEY,
+        id_acao INTEGER,
+        executada BOOLEAN,
+        data_execucao DATETIME,
+        observacao_produtor VARCHAR(255),
+        FOREIGN KEY (id_acao) REFERENCES AcaoAgricola(id_acao)
+    );
+"""
+# Uma ação cobre as medidas id_medida..id_medida_fim de um dispositivo (mesma recomendação)
+COLUNAS_ACAO = [
+    ("id_dispositivo", "INTEGER"),
+    ("id_medida_fim", "INTEGER"),
+    ("inicio_ms", "INTEGER"),
+    ("fim_ms", "INTEGER"),
+    ("n_medidas", "INTEGER"),
+    ("versao_modelo", "VARCHAR(20)"),
+    ("substituida_ms", "INTEGER"),  # recomendação refeita (--reinicia) mas mantida pelo histórico do produtor
+]
+DDL_INDICES_ACAO = [
+    "DROP INDEX IF EXISTS idx_acaoagricola_id_medida",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_acaoagricola_id_medida_vigente ON AcaoAgricola(id_medida) "
+    "WHERE substituida_ms IS NULL",
+    "CREATE INDEX IF NOT EXISTS idx_acaoagricola_inicio_ms ON AcaoAgricola(inicio_ms)",
+    "CREATE INDEX IF NOT EXISTS idx_historicoacao_id_acao ON HistoricoAcao(id_acao)",
+]
+
+
+def migra_acoes(c):
+    """Cria AcaoAgricola/HistoricoAcao e acrescenta as colunas de intervalo (ADD COLUMN não reescreve a tabela)."""
+    sql = c.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'AcaoAgricola'").fetchone()
+    if sql and 'AUTOINCREMENT' not in sql[0].upper():
+        _recria_acao_autoincrement(c)
+    c.execute(DDL_ACAO_AGRICOLA)
+    c.execute(DDL_HISTORICO_ACAO)
+    cols = colunas(c, 'AcaoAgricola')
+    for nome, tipo in COLUNAS_ACAO:
+        if nome not in cols:
+            c.execute(f"ALTER TABLE AcaoAgricola ADD COLUMN {nome} {tipo}")
+    for ddl in DDL_INDICES_ACAO:
+        c.execute(ddl)
+
+
+def _recria_acao_autoincrement(c):
+    """
+    Reconstrói AcaoAgricola com AUTOINCREMENT: ids de ações apagadas nunca são reutilizados,
+    então um HistoricoAcao antigo não passa a apontar para uma ação nova.
+    """
+    conn = c.connection
+    conn.commit()
+    fks = c.execute("PRAGMA foreign_keys").fetchone()[0]
+    c.execute("PRAGMA foreign_keys = OFF")
+    try:
+        c.execute("BEGIN")
+        cols = [linha[1] for linha in c.execute("PRAGMA table_info(AcaoAgricola)")]
+        c.execute(DDL_ACAO_AGRICOLA.replace("AcaoAgricola (", "AcaoAgricola_nova (", 1))
+        for nome, tipo in COLUNAS_ACAO:
+            if nome in cols:
+                c.execute(f"ALTER TABLE AcaoAgricola_nova ADD COLUMN {nome} {tipo}")
+        c.execute(f"INSERT INTO AcaoAgricola_nova ({', '.join(cols)}) SELECT {', '.join(cols)} FROM AcaoAgricola")
+        c.execute("DROP TABLE AcaoAgricola")
+        c.execute("ALTER TABLE AcaoAgricola_nova RENAME TO AcaoAgricola")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        c.execute(f"PRAGMA foreign_keys = {'ON' if fks else 'OFF'}")
+
+
+def migra_medida_solo(c):
+    """Cria/atualiza MedidaSolo, seus índices e a visão de compatibilidade."""
+    cols = colunas(c, 'MedidaSolo')
+    if not cols:
+        c.execute(DDL_MEDIDA_SOLO)
+    elif 'data_hora_ms' not in cols:
+        # Também acrescenta peso (sample_weight do treino) a bancos antigos
+        _recria_com_data_hora_ms(c)
+    for ddl in DDL_INDICES:
+        c.execute(ddl)
+    c.execute(DDL_VISAO)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+cache_resultados.py
+Author: Mário (DevOps/SRE)
+Version: 1.0
+Date: 2026-10-19
+
+Cache de resultados de consulta compartilhado entre threads, workers e processos (SQLite em arquivo).
+- Chave: nome da consulta + parâmetros; cada entrada guarda a "versão" dos dados de origem
+  (ex.: MAX(id_medida)) e é recalculada só quando a versão muda
+- Um único cálculo por versão: quem não acha a entrada pega um lock de arquivo (flock) e confere
+  de novo antes de consultar o banco, então N clientes/workers custam uma consulta por atualização
+- Cópia em memória da última versão de cada chave (evita desserializar a cada requisição)
+- Sem fcntl (Windows) o lock é só entre threads do processo
+
+Variáveis de ambiente:
+    FARMTECH_CACHE=backend/cache/resultados.db   arquivo do cache
+
+Uso:
+    ./cache_resultados.py            # lista as entradas
+    ./cache_resultados.py --limpa
+
+Licença: MIT
+"""
+
+import argparse
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+import metricas
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+ENV_CACHE = 'FARMTECH_CACHE'
+CACHE_FILE = os.path.join(os.path.dirname(__file__), 'cache/resultados.db')
+
+DDL_CACHE = """
+    CREATE TABLE IF NOT EXISTS CacheResultado (
+        nome VARCHAR(100) NOT NULL,
+        params TEXT NOT NULL,
+        versao TEXT NOT NULL,
+        criado_ms INTEGER NOT NULL,
+        calculo_ms REAL,
+        valor BLOB NOT NULL,
+        PRIMARY KEY (nome, params)
+    );
+"""
+
+
+class CacheResultados:
+    def __init__(self, arquivo=None):
+        self.arquivo = os.path.abspath(arquivo or os.environ.get(ENV_CACHE, CACHE_FILE))
+        self.arquivo_lock = self.arquivo + '.lock'
+        self.memoria = {}
+        self._lock_threads = threading.Lock()
+        self._pronto = False
+
+    def _conecta(self):
+        if not self._pronto:
+            os.makedirs(os.path.dirname(self.arquivo), exist_ok=True)
+        conn = sqlite3.connect(self.arquivo, timeout=30)
+        if not self._pronto:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(DDL_CACHE)
+            conn.commit()
+            self._pronto = True
+        return conn
+
+    def _le(self, nome, params):
+        conn = self._conecta()
+        try:
+            return conn.execute("SELECT versao, valor FROM CacheResultado WHERE nome = ? AND params = ?",
+                                (nome, params)).fetchone()
+        finally:
+            conn.close()
+
+    def _grava(self, nome, params, versao, valor, calculo_s):
+        conn = self._conecta()
+        try:
+            conn.execute("INSERT OR REPLACE INTO CacheResultado VALUES (?, ?, ?, ?, ?, ?)",
+                         (nome, params, versao, int(time.time() * 1000), calculo_s * 1000,
+                          pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL)))
+            conn.commit()
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _exclusivo(self):
+        """Lock entre processos (flock) e entre threads deste processo."""
+        with self._lock_threads:
+            if fcntl is None:
+                yield
+                return
+            with open(self.arquivo_lock, 'a') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def obtem(self, nome, versao, calcula, **params):
+        """
+        Resultado de calcula(**params) para a `versao` atual dos dados de origem.
+        Recalcula (uma vez, entre todos os processos) só quando a versão muda.
+        """
+        chave_params = json.dumps(params, sort_keys=True, default=str)
+        versao = str(versao)
+        chave = (nome, chave_params)
+        em_memoria = self.memoria.get(chave)
+        if em_memoria is not None and em_memoria[0] == versao:
+            metricas.incrementa('cache_acertos')
+            return em_memoria[1]
+        linha = self._le(nome, chave_params)
+        if linha is None or linha[0] != versao:
+            with self._exclusivo():
+                # Outro worker pode ter calculado enquanto esperávamos o lock
+                linha = self._le(nome, chave_params)
+                if linha is None or linha[0] != versao:
+                    metricas.incrementa('cache_faltas')
+                    t = time.perf_counter()
+                    valor = calcula(**params)
+                    self._grava(nome, chave_params, versao, valor, time.perf_counter() - t)
+                    self.memoria[chave] = (versao, valor)
+                    return valor
+        metricas.incrementa('cache_acertos')
+        valor = pickle.loads(linha[1])
+        self.memoria[chave] = (versao, valor)
+        return valor
+
+    def entradas(self):
+        conn = self._conecta()
+        try:
+            return conn.execute("""SELECT nome, params, versao, criado_ms, calculo_ms, LENGTH(valor)
+                                   FROM CacheResultado ORDER BY nome, params""").fetchall()
+        finally:
+            conn.close()
+
+    def limpa(self):
+        conn = self._conecta()
+        try:
+            conn.execute("DELETE FROM CacheResultado")
+            conn.commit()
+        finally:
+            conn.close()
+        self.memoria.clear()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspeciona o cache de resultados compartilhado.")
+    parser.add_argument('--arquivo', type=str, default=None, help=f'Arquivo do cache (default: ${ENV_CACHE} ou {CACHE_FILE})')
+    parser.add_argument('--limpa', action='store_true', help='Apaga todas as entradas')
+    args = parser.parse_args()
+    cache = CacheResultados(args.arquivo)
+    if args.limpa:
+        cache.limpa()
+        print(f"Cache {cache.arquivo} limpo.")
+    else:
+        for nome, params, versao, criado_ms, calculo_ms, tamanho in cache.entradas():
+            print(f"{nome:<12} {params:<30} versão {versao:<20} {tamanho / 1024:>9.1f} KiB  "
+                  f"cálculo {calculo_ms:.0f} ms  {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(criado_ms / 1000))}")
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+estatisticas.py
+Author: Mário (DevOps/SRE)
+Version: 1.0
+Date: 2026-10-19
+
+Estatísticas contínuas por dispositivo, calculadas na ingestão (O(1) por leitura).
+- Welford: n, média, variância, mínimo e máximo desde o início
+- EWMA: média recente; taxa de variação da EWMA (unidades por minuto)
+- Relé: ciclo de trabalho (fração das leituras com relé LIGADO, total e recente)
+- Faixas configuráveis; leituras fora delas geram alertas em AlertaMedida
+  (um alerta por entrada na condição, não um por leitura); a saída da condição grava
+  encerrado_ms, e os alertas abertos são retomados quando o coletor reinicia
+- Estado gravado em EstatisticaDispositivo: os dashboards leem só essa tabela
+
+Uso:
+    ./estatisticas.py                 # mostra o estado e os últimos alertas
+    ./estatisticas.py --recalcula     # refaz o estado a partir do histórico de MedidaSolo
+
+Licença: MIT
+"""
+
+import argparse
+import json
+import math
+import os
+import sqlite3
+import banco
+
+DB_FILE = os.path.join(os.path.dirname(__file__), '../farm_data.db')
+ALFA = 0.1            # peso da leitura nova nas EWMA
+AQUECIMENTO_N = 100   # leituras antes de avaliar deriva
+GRAVA_S = 2.0         # intervalo mínimo entre gravações do estado
+TAXA_JANELA_S = 60.0  # taxa de variação medida na EWMA a cada janela (o ruído entre leituras não conta)
+
+# Faixas padrão; sobrescreva com --faixas arquivo.json no coletor (mesmas chaves)
+# min/max: valor da leitura; taxa_max: |taxa da EWMA| por minuto;
+# travado_n: leituras idênticas seguidas; deriva_max: |EWMA - média|; duty_max: EWMA do relé
+FAIXAS = {
+    'valor_umidade': {'min': 20.0, 'max': 80.0, 'taxa_max': 5.0, 'travado_n': 120},
+    'valor_ph': {'min': 5.0, 'max': 7.5, 'deriva_max': 0.5, 'travado_n': 120},
+    'rele': {'duty_max': 0.9},
+}
+
+DDL_ESTADO = """
+    CREATE TABLE IF NOT EXISTS EstatisticaDispositivo (
+        id_dispositivo INTEGER NOT NULL,
+        variavel VARCHAR(30) NOT NULL,
+        n INTEGER NOT NULL,
+        media DOUBLE,
+        variancia DOUBLE,
+        minimo DOUBLE,
+        maximo DOUBLE,
+        ewma DOUBLE,
+        taxa_min DOUBLE,
+        ultimo_valor DOUBLE,
+        ultimo_ms INTEGER,
+        repeticoes INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (id_dispositivo, variavel),
+        FOREIGN KEY (id_dispositivo) REFERENCES DispositivoCampo(id_dispositivo)
+    );
+"""
+DDL_ALERTA = """
+    CREATE TABLE IF NOT EXISTS AlertaMedida (
+        id_alerta INTEGER PRIMARY KEY,
+        id_medida INTEGER,
+        id_dispositivo INTEGER,
+        data_hora_ms INTEGER,
+        variavel VARCHAR(30),
+        tipo VARCHAR(20),
+        valor DOUBLE,
+        limite DOUBLE,
+        encerrado_ms INTEGER,
+        FOREIGN KEY (id_medida) REFERENCES MedidaSolo(id_medida),
+        FOREIGN KEY (id_dispositivo) REFERENCES DispositivoCampo(id_dispositivo)
+    );
+"""
+DDL_INDICES = [
+    "CREATE INDEX IF NOT EXISTS idx_alertamedida_data_hora_ms ON AlertaMedida(data_hora_ms)",
+]
+COLUNAS_ESTADO = ('n', 'media', 'variancia', 'minimo', 'maximo', 'ewma', 'taxa_min',
+                  'ultimo_valor', 'ultimo_ms', 'repeticoes')
+
+# Consultas dos dashboards (tabelas pequenas; nada de varrer MedidaSolo)
+SQL_ESTADO = """
+    SELECT e.id_dispositivo, d.descricao AS dispositivo, e.variavel, e.n, e.media, e.variancia,
+           e.minimo, e.maximo, e.ewma, e.taxa_min, e.ultimo_valor, e.ultimo_ms, e.repeticoes
+    FROM EstatisticaDispositivo e
+    LEFT JOIN DispositivoCampo d ON d.id_dispositivo = e.id_dispositivo
+    ORDER BY e.id_dispositivo, e.variavel
+"""
+SQL_ALERTAS = """
+    SELECT id_alerta, id_dispositivo, data_hora_ms, variavel, tipo, valor, limite, id_medida,
+           encerrado_ms IS NULL AS ativo
+    FROM AlertaMedida ORDER BY data_hora_ms DESC LIMIT ?
+"""
+
+
+def inicializa_estatisticas(c):
+    c.execute(DDL_ESTADO)
+    c.execute(DDL_ALERTA)
+    if 'encerrado_ms' not in banco.colunas(c, 'AlertaMedida'):
+        # Bancos anteriores: os alertas ficam abertos e se encerram na próxima leitura normal
+        c.execute("ALTER TABLE AlertaMedida ADD COLUMN encerrado_ms INTEGER")
+    for ddl in DDL_INDICES:
+        c.execute(ddl)
+
+
+def carrega_faixas(caminho=None):
+    """FAIXAS com as chaves do JSON (se houver) sobrepostas por variável."""
+    faixas = {k: dict(v) for k, v in FAIXAS.items()}
+    if caminho:
+        with open(caminho) as f:
+            for variavel, limites in json.load(f).items():
+                faixas.setdefault(variavel, {}).update(limites)
+    return faixas
+
+
+class Estatistica:
+    """Estatística contínua de uma variável (Welford + EWMA)."""
+
+    __slots__ = tuple(col for col in COLUNAS_ESTADO if col != 'variancia') + ('m2', 'ref_ewma', 'ref_ms')
+
+    def __init__(self, n=0, media=0.0, variancia=0.0, minimo=None, maximo=None, ewma=None,
+                 taxa_min=0.0, ultimo_valor=None, ultimo_ms=None, repeticoes=0):
+        self.n, self.media = n, media
+        self.m2 = (variancia or 0.0) * (n - 1) if n > 1 else 0.0
+        self.minimo, self.maximo, self.ewma = minimo, maximo, ewma
+        self.taxa_min, self.ultimo_valor, self.ultimo_ms = taxa_min or 0.0, ultimo_valor, ultimo_ms
+        self.repeticoes = repeticoes
+        self.ref_ewma, self.ref_ms = ewma, ultimo_ms
+
+    @property
+    def variancia(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    def atualiza(self, valor, t_ms):
+        self.n += 1
+        delta = valor - self.media
+        self.media += delta / self.n
+        self.m2 += delta * (valor - self.media)
+        self.minimo = valor if self.minimo is None else min(self.minimo, valor)
+        self.maximo = valor if self.maximo is None else max(self.maximo, valor)
+        self.ewma = valor if self.ewma is None else self.ewma + ALFA * (valor - self.ewma)
+        if self.ref_ms is None:
+            self.ref_ewma, self.ref_ms = self.ewma, t_ms
+        elif t_ms - self.ref_ms >= TAXA_JANELA_S * 1000:
+            self.taxa_min = (self.ewma - self.ref_ewma) / ((t_ms - self.ref_ms) / 60000)
+            self.ref_ewma, self.ref_ms = self.ewma, t_ms
+        self.repeticoes = self.repeticoes + 1 if valor == self.ultimo_valor else 1
+        self.ultimo_valor, self.ultimo_ms = valor, t_ms
+
+    def linha(self):
+        return tuple(getattr(self, col) for col in COLUNAS_ESTADO)
+
+
+def _violacoes(est, valor, faixa):
+    """[(tipo, valor_testado, limite)] das condições de alerta ativas nesta leitura."""
+    v = []
+    if 'min' in faixa and valor < faixa['min']:
+        v.append(('abaixo', valor, faixa['min']))
+    if 'max' in faixa and valor > faixa['max']:
+        v.append(('acima', valor, faixa['max']))
+    if 'taxa_max' in faixa and abs(est.taxa_min) > faixa['taxa_max']:
+        v.append(('taxa', est.taxa_min, faixa['taxa_max']))
+    if 'travado_n' in faixa and est.repeticoes >= faixa['travado_n']:
+        v.append(('travado', valor, faixa['travado_n']))
+    if 'deriva_max' in faixa and est.n >= AQUECIMENTO_N and abs(est.ewma - est.media) > faixa['deriva_max']:
+        v.append(('deriva', est.ewma, faixa['deriva_max']))
+    if 'duty_max' in faixa and est.n >= 1 / ALFA and est.ewma > faixa['duty_max']:
+        v.append(('duty', est.ewma, faixa['duty_max']))
+    return v
+
+
+class MonitorDispositivo:
+    """Estado de um dispositivo: uma Estatistica por variável e as condições de alerta ativas."""
+
+    def __init__(self, id_dispositivo, faixas=None):
+        self.id_dispositivo = id_dispositivo
+        self.faixas = faixas or FAIXAS
+        self.estatisticas = {}
+        self.ativos = set()
+        self.pendentes = []     # alertas novos ainda não gravados (o último item é encerrado_ms)
+        self.encerrados = []    # (encerrado_ms, variavel, tipo) de alertas já gravados
+        self.ultima_gravacao = None
+
+    def carrega(self, c):
+        """Retoma o estado gravado (reinícios do coletor não zeram as estatísticas)."""
+        for linha in c.execute(f"SELECT variavel, {', '.join(COLUNAS_ESTADO)} FROM EstatisticaDispositivo "
+                               "WHERE id_dispositivo = ?", (self.id_dispositivo,)):
+            self.estatisticas[linha[0]] = Estatistica(*linha[1:])
+        # Condições que estavam ativas: não geram alerta de novo ao reiniciar
+        self.ativos = set(c.execute("SELECT DISTINCT variavel, tipo FROM AlertaMedida "
+                                    "WHERE id_dispositivo = ? AND encerrado_ms IS NULL", (self.id_dispositivo,)))
+        return self
+
+    def atualiza(self, id_medida, t_ms, leituras):
+        """
+        leituras: {variavel: valor}; None/NaN são ignorados (booleans viram 0/1).
+        Retorna os alertas novos (também acumulados em self.pendentes até a gravação).
+        """
+        novos = []
+        for variavel, valor in leituras.items():
+            if valor is None or (isinstance(valor, float) and math.isnan(valor)):
+                continue
+            valor = float(valor)
+            est = self.estatisticas.get(variavel)
+            if est is None:
+                est = self.estatisticas[variavel] = Estatistica()
+            est.atualiza(valor, t_ms)
+            violacoes = _violacoes(est, valor, self.faixas.get(variavel, {}))
+            tipos = {tipo for tipo, _, _ in violacoes}
+            for tipo, testado, limite in violacoes:
+                if (variavel, tipo) not in self.ativos:
+                    novos.append([id_medida, self.id_dispositivo, t_ms, variavel, tipo, testado, limite, None])
+            for var, tipo in self.ativos:
+                if var == variavel and tipo not in tipos:
+                    self._encerra(t_ms, var, tipo)
+            self.ativos = {(var, tipo) for var, tipo in self.ativos if var != variavel} | \
+                          {(variavel, tipo) for tipo in tipos}
+        self.pendentes.extend(novos)
+        return novos
+
+    def _encerra(self, t_ms, variavel, tipo):
+        for alerta in reversed(self.pendentes):
+            if alerta[3] == variavel and alerta[4] == tipo and alerta[7] is None:
+                alerta[7] = t_ms  # ainda não gravado: sai já encerrado
+                return
+        self.encerrados.append((t_ms, variavel, tipo))
+
+    def grava_alertas(self, c):
+        """Encerra os alertas já gravados e insere os novos (nessa ordem)."""
+        c.executemany("""
+            UPDATE AlertaMedida SET encerrado_ms = ?
+            WHERE id_dispositivo = ? AND variavel = ? AND tipo = ? AND encerrado_ms IS NULL
+        """, [(t_ms, self.id_dispositivo, var, tipo) for t_ms, var, tipo in self.encerrados])
+        c.executemany("""
+            INSERT INTO AlertaMedida (id_medida, id_dispositivo, data_hora_ms, variavel, tipo, valor, limite, encerrado_ms)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, self.pendentes)
+        self.pendentes, self.encerrados = [], []
+
+    def precisa_gravar(self, t_ms):
+        return bool(self.pendentes or self.encerrados) or self.ultima_gravacao is None or t_ms - self.ultima_gravacao >= GRAVA_S * 1000
+
+    def grava(self, c, t_ms):
+        """UPSERT do estado e INSERT dos alertas pendentes (o commit fica com quem chama)."""
+        c.executemany(f"""
+            INSERT OR REPLACE INTO EstatisticaDispositivo (id_dispositivo, variavel, {', '.join(COLUNAS_ESTADO)})
+            VALUES (?, ?, {', '.join('?' * len(COLUNAS_ESTADO))})
+        """, [(self.id_dispositivo, var, *est.linha()) for var, est in self.estatisticas.items()])
+        self.grava_alertas(c)
+        self.ultima_gravacao = t_ms
+
+
+def le_estado(conn, alertas=20):
+    """(estado, alertas) como DataFrames, para os dashboards."""
+    import pandas as pd
+    c = conn.cursor()
+    inicializa_estatisticas(c)
+    estado = pd.read_sql(SQL_ESTADO, conn)
+    estado['desvio'] = estado['variancia'].clip(lower=0) ** 0.5
+    estado['atualizado'] = banco.ms_para_datetime(estado.pop('ultimo_ms'))
+    ultimos = pd.read_sql(SQL_ALERTAS, conn, params=(alertas,))
+    ultimos.insert(0, 'data_hora', banco.ms_para_datetime(ultimos.pop('data_hora_ms')))
+    return estado, ultimos
+
+
+def recalcula(conn, faixas=None):
+    """
+    Refaz estado e alertas a partir do histórico de MedidaSolo (streaming, memória O(dispositivos)).
+    O relé não é gravado em MedidaSolo, então o ciclo de trabalho só existe para leituras ao vivo.
+    """
+    c = conn.cursor()
+    inicializa_estatisticas(c)
+    c.execute("DELETE FROM EstatisticaDispositivo")
+    c.execute("DELETE FROM AlertaMedida")
+    monitores = {}
+    leitura = conn.cursor()
+    leitura.execute("""
+        SELECT id_medida, COALESCE(id_dispositivo, 0), data_hora_ms, valor_umidade, valor_ph
+        FROM MedidaSolo ORDER BY data_hora_ms, id_medida
+    """)
+    n = 0
+    while True:
+        lote = leitura.fetchmany(10000)
+        if not lote:
+            break
+        for id_medida, id_disp, t_ms, umidade, ph in lote:
+            monitor = monitores.get(id_disp)
+            if monitor is None:
+                monitor = monitores[id_disp] = MonitorDispositivo(id_disp, faixas)
+            monitor.atualiza(id_medida, t_ms, {'valor_umidade': umidade, 'valor_ph': ph})
+        for monitor in monitores.values():
+            monitor.grava_alertas(c)
+        n += len(lote)
+    for monitor in monitores.values():
+        monitor.grava(c, banco.agora_ms())
+    conn.commit()
+    return n
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Estado das estatísticas contínuas e alertas por dispositivo.")
+    parser.add_argument('--db', type=str, default=DB_FILE, help='Caminho do banco SQLite')
+    parser.add_argument('--recalcula', action='store_true', help='Refaz estado e alertas a partir de MedidaSolo')
+    parser.add_argument('--faixas', type=str, default=None, help='JSON com faixas que sobrepõem as padrão')
+    parser.add_argument('--alertas', type=int, default=20, help='Quantos alertas recentes mostrar')
+    args = parser.parse_args()
+    conn = sqlite3.connect(args.db)
+    banco.migra_medida_solo(conn.cursor())
+    if args.recalcula:
+        n = recalcula(conn, carrega_faixas(args.faixas))
+        print(f"Estado recalculado a partir de {n} medidas.")
+    estado, ultimos = le_estado(conn, args.alertas)
+    conn.close()
+    print(estado.drop(columns=['variancia']).to_string(index=False))
+    print(f"\nÚltimos {len(ultimos)} alertas:")
+    print(ultimos.to_string(index=False))
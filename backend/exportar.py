@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+exportar.py
+Author: Mário (DevOps/SRE)
+Version: 1.0
+Date: 2026-10-19
+
+Exporta medidas de MedidaSolo em streaming, com memória limitada, para análise fora dos dashboards.
+- Filtros: intervalo de tempo (hora local, fim exclusivo), talhão e dispositivo
+- Lê do banco principal e das partições de retenção (archive/medidas_AAAAMM.db), só dos meses do intervalo
+- Cursor do SQLite consumido em blocos fixos (fetchmany): nunca carrega o intervalo inteiro
+- Formatos: CSV, CSV gzip e Parquet (colunar, um row group por bloco; requer pyarrow)
+- --por-dia: um arquivo por dia, exportados em paralelo por processos
+
+Uso:
+    ./exportar.py --inicio 2025-05-01 --fim 2025-06-01 --saida maio.csv.gz
+    ./exportar.py --talhao 1 --dispositivo 2 --saida talhao1.parquet
+    ./exportar.py --inicio 2025-01-01 --fim 2025-07-01 --por-dia export/ --formato parquet --processos 4
+
+Licença: MIT
+"""
+
+import argparse
+import csv
+import gzip
+import os
+import re
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+import banco
+import retencao
+
+DB_FILE = os.path.join(os.path.dirname(__file__), '../farm_data.db')
+LOTE = 10000
+FORMATOS = {'.csv': 'csv', '.csv.gz': 'csv.gz', '.parquet': 'parquet'}
+
+COLUNAS = ['id_medida', 'data_hora_ms', 'data_hora', 'valor_umidade', 'valor_ph', 'valor_npk',
+           'temperatura', 'previsao_chuva', 'crescimento_percentual', 'id_dispositivo', 'id_talhao', 'peso']
+SELECT_MEDIDAS = f"""
+    SELECT m.id_medida, m.data_hora_ms, strftime('%Y-%m-%d %H:%M:%S', {banco.SQL_LOCALTIME}),
+           m.valor_umidade, m.valor_ph, m.valor_npk, m.temperatura, m.previsao_chuva,
+           m.crescimento_percentual, m.id_dispositivo, m.id_talhao, m.peso
+    FROM MedidaSolo m
+"""
+
+
+def formato_do_arquivo(caminho):
+    for ext in sorted(FORMATOS, key=len, reverse=True):
+        if caminho.endswith(ext):
+            return FORMATOS[ext]
+    raise ValueError(f"Extensão não reconhecida em {caminho} (use {', '.join(FORMATOS)})")
+
+
+def _extensao(formato):
+    return {v: k for k, v in FORMATOS.items()}[formato]
+
+
+def fontes(inicio_ms=None, fim_ms=None, db_file=DB_FILE, archive_dir=retencao.ARCHIVE_DIR, arquivo=True):
+    """Bancos com medidas do intervalo: partições dos meses que o tocam e, por último, o banco principal."""
+    bancos = []
+    if arquivo:
+        for particao in retencao.particoes(archive_dir):
+            mes = re.search(r"medidas_(\d{6})\.db$", particao)
+            if mes:
+                ini_mes, fim_mes = retencao._limites_mes(mes.group(1))
+                if (inicio_ms is not None and fim_mes <= inicio_ms) or (fim_ms is not None and ini_mes >= fim_ms):
+                    continue
+            bancos.append(particao)
+    bancos.append(db_file)
+    return bancos
+
+
+def _filtro(inicio_ms, fim_ms, talhao, dispositivo):
+    condicoes, params = [], []
+    for sql, valor in (("m.data_hora_ms >= ?", inicio_ms), ("m.data_hora_ms < ?", fim_ms),
+                       ("m.id_talhao = ?", talhao), ("m.id_dispositivo = ?", dispositivo)):
+        if valor is not None:
+            condicoes.append(sql)
+            params.append(valor)
+    return ("WHERE " + " AND ".join(condicoes) if condicoes else ""), params
+
+
+def blocos(inicio_ms=None, fim_ms=None, talhao=None, dispositivo=None, lote=LOTE, **kw_fontes):
+    """Gera listas de até `lote` linhas (na ordem de COLUNAS), fonte a fonte, por data_hora_ms."""
+    filtro, params = _filtro(inicio_ms, fim_ms, talhao, dispositivo)
+    for db in fontes(inicio_ms, fim_ms, **kw_fontes):
+        conn = sqlite3.connect(f"file:{db}?mode=ro", uri=True)
+        try:
+            if 'data_hora_ms' not in banco.colunas(conn.cursor(), 'MedidaSolo'):
+                continue  # banco vazio ou partição incompleta
+            cursor = conn.execute(f"{SELECT_MEDIDAS} {filtro} ORDER BY m.data_hora_ms, m.id_medida", params)
+            while True:
+                linhas = cursor.fetchmany(lote)
+                if not linhas:
+                    break
+                yield linhas
+        finally:
+            conn.close()
+
+
+class _EscritorCsv:
+    def __init__(self, caminho, formato):
+        self.f = gzip.open(caminho, 'wt', newline='', encoding='utf-8') if formato == 'csv.gz' \
+            else open(caminho, 'w', newline='', encoding='utf-8')
+        self.csv = csv.writer(self.f)
+        self.csv.writerow(COLUNAS)
+
+    def escreve(self, linhas):
+        self.csv.writerows(linhas)
+
+    def fecha(self):
+        self.f.close()
+
+
+class _EscritorParquet:
+    def __init__(self, caminho, formato):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Formato parquet requer pyarrow: pip install pyarrow")
+        self.pa = pa
+        tipos = {'id_medida': pa.int64(), 'data_hora_ms': pa.int64(), 'data_hora': pa.string(),
+                 'valor_npk': pa.string(), 'previsao_chuva': pa.string(),
+                 'id_dispositivo': pa.int64(), 'id_talhao': pa.int64()}
+        self.schema = pa.schema([(col, tipos.get(col, pa.float64())) for col in COLUNAS])
+        self.writer = pq.ParquetWriter(caminho, self.schema, compression='zstd')
+
+    def escreve(self, linhas):
+        colunas = list(zip(*linhas))
+        self.writer.write_table(self.pa.Table.from_arrays(
+            [self.pa.array(valores, type=campo.type) for valores, campo in zip(colunas, self.schema)],
+            schema=self.schema))
+
+    def fecha(self):
+        self.writer.close()
+
+
+def exporta(saida, inicio_ms=None, fim_ms=None, talhao=None, dispositivo=None, formato=None,
+            lote=LOTE, **kw_fontes):
+    """Grava as medidas filtradas em `saida` (formato pela extensão, se não informado). Retorna as linhas."""
+    formato = formato or formato_do_arquivo(saida)
+    escritor = (_EscritorParquet if formato == 'parquet' else _EscritorCsv)(saida + '.tmp', formato)
+    total = 0
+    try:
+        for linhas in blocos(inicio_ms, fim_ms, talhao, dispositivo, lote, **kw_fontes):
+            escritor.escreve(linhas)
+            total += len(linhas)
+    except BaseException:
+        escritor.fecha()
+        os.remove(saida + '.tmp')
+        raise
+    escritor.fecha()
+    os.replace(saida + '.tmp', saida)
+    return total
+
+
+def _dias(inicio, fim):
+    dia = datetime(inicio.year, inicio.month, inicio.day)
+    while dia < fim:
+        yield max(dia, inicio), min(dia + timedelta(days=1), fim)
+        dia += timedelta(days=1)
+
+
+def _exporta_dia(args):
+    saida, inicio_ms, fim_ms, kw = args
+    n = exporta(saida, inicio_ms, fim_ms, **kw)
+    if not n:
+        os.remove(saida)
+    return saida, n
+
+
+def exporta_por_dia(diretorio, inicio, fim, formato='csv.gz', processos=None, **kw):
+    """Um arquivo medidas_AAAA-MM-DD por dia de [inicio, fim) (datetimes locais), em paralelo. Retorna {arquivo: linhas}."""
+    os.makedirs(diretorio, exist_ok=True)
+    tarefas = [(os.path.join(diretorio, f"medidas_{a:%Y-%m-%d}{_extensao(formato)}"),
+                banco.datetime_para_ms(a), banco.datetime_para_ms(b), dict(kw, formato=formato))
+               for a, b in _dias(inicio, fim)]
+    with ProcessPoolExecutor(max_workers=processos) as pool:
+        return {saida: n for saida, n in pool.map(_exporta_dia, tarefas) if n}
+
+
+def limites(**kw_fontes):
+    """(min, max) de data_hora_ms entre todas as fontes, para --por-dia sem --inicio/--fim."""
+    extremos = []
+    for db in fontes(**kw_fontes):
+        conn = sqlite3.connect(f"file:{db}?mode=ro", uri=True)
+        try:
+            if 'data_hora_ms' in banco.colunas(conn.cursor(), 'MedidaSolo'):
+                extremos += [v for v in conn.execute("SELECT MIN(data_hora_ms), MAX(data_hora_ms) FROM MedidaSolo")
+                             .fetchone() if v is not None]
+        finally:
+            conn.close()
+    return (min(extremos), max(extremos)) if extremos else (None, None)
+
+
+def _data(texto):
+    return datetime.fromisoformat(texto) if texto else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta medidas (banco principal + partições) em streaming.")
+    parser.add_argument('--inicio', type=str, default=None, help='Data/hora local ISO (ex.: 2025-05-01 ou 2025-05-01T06:00)')
+    parser.add_argument('--fim', type=str, default=None, help='Data/hora local ISO, exclusiva')
+    parser.add_argument('--talhao', type=int, default=None, help='id_talhao')
+    parser.add_argument('--dispositivo', type=int, default=None, help='id_dispositivo')
+    destino = parser.add_mutually_exclusive_group(required=True)
+    destino.add_argument('--saida', type=str, help='Arquivo .csv, .csv.gz ou .parquet')
+    destino.add_argument('--por-dia', type=str, metavar='DIR', help='Um arquivo por dia neste diretório')
+    parser.add_argument('--formato', type=str, choices=sorted(FORMATOS.values()), default=None,
+                        help='Formato (default: pela extensão de --saida; csv.gz com --por-dia)')
+    parser.add_argument('--processos', type=int, default=None, help='Processos no --por-dia (default: CPUs)')
+    parser.add_argument('--lote', type=int, default=LOTE, help=f'Linhas por bloco (default: {LOTE})')
+    parser.add_argument('--db', type=str, default=DB_FILE, help='Caminho do banco SQLite')
+    parser.add_argument('--archive-dir', type=str, default=retencao.ARCHIVE_DIR, help='Diretório das partições')
+    parser.add_argument('--sem-arquivo', action='store_true', help='Só o banco principal, sem as partições')
+    args = parser.parse_args()
+
+    # Bancos antigos (data_hora em texto) são migrados como nos demais consumidores
+    conn = sqlite3.connect(args.db)
+    banco.migra_medida_solo(conn.cursor())
+    conn.commit()
+    conn.close()
+
+    kw_fontes = dict(db_file=args.db, archive_dir=args.archive_dir, arquivo=not args.sem_arquivo)
+    filtros = dict(talhao=args.talhao, dispositivo=args.dispositivo, lote=args.lote, **kw_fontes)
+    inicio, fim = _data(args.inicio), _data(args.fim)
+    if args.saida:
+        n = exporta(args.saida, inicio and banco.datetime_para_ms(inicio), fim and banco.datetime_para_ms(fim),
+                    formato=args.formato, **filtros)
+        print(f"{n} medidas exportadas em {args.saida}.")
+    else:
+        if inicio is None or fim is None:
+            minimo, maximo = limites(**kw_fontes)
+            if minimo is None:
+                raise SystemExit("Nenhuma medida para exportar.")
+            inicio = inicio or datetime.fromtimestamp(minimo / 1000)
+            fim = fim or datetime.fromtimestamp(maximo / 1000) + timedelta(milliseconds=1)
+        arquivos = exporta_por_dia(args.por_dia, inicio, fim, args.formato or 'csv.gz', args.processos, **filtros)
+        for saida, n in sorted(arquivos.items()):
+            print(f"{saida}: {n} medidas")
+        print(f"{sum(arquivos.values())} medidas exportadas em {len(arquivos)} arquivo(s).")
@@ -11,6 +11,7 @@ Integração ESP32 (Wokwi ) com banco MER completo em SQLite.
 - Cria tabelas se necessário
 - Garante integridade relacional
 - Insere dados do serial em MedidaSolo
+- Serial em linhas de texto (padrão) ou quadros binários com CRC (--binario, ver telemetria_binaria.py)
 - Pronto para uso didático e produção simples
 
 Este código é parte do projeto FarmTech, um sistema de monitoramento e controle agrícola.
@@ -19,13 +20,27 @@ MER original não foi modificado, apenas adaptado para SQLite.
 Licença: MIT
 """
 
+import time
+_INICIO_IMPORTS = time.perf_counter()
 import sqlite3
+import argparse
+import logging
+import signal
 from datetime import datetime
 import serial
 import re
 import os
-import joblib
-import pandas as pd
+import registro_modelos
+import features
+import banco
+import estatisticas
+import farmtech_logs
+import metricas
+import telemetria_binaria
+# pandas/sklearn/joblib/numpy só são importados com --inferencia (ver carrega_modelo)
+_IMPORTS_S = time.perf_counter() - _INICIO_IMPORTS
+
+log = logging.getLogger('farmtech.coleta')
 
 DB_FILE = os.path.join(os.path.dirname(__file__), '../farm_data.db')
 # Para Wokwi RFC2217: 'rfc2217://localhost:8180'
@@ -33,7 +48,7 @@ DB_FILE = os.path.join(os.path.dirname(__file__), '../farm_data.db')
 # Para hardware real (Windows): 'COM3', 'COM4', etc.
 SERIAL_URL = 'rfc2217://localhost:8181'
 BAUDRATE = 115200
-MODEL_PATH = os.path.join(os.path.dirname(__file__), 'models/ml_irrigacao.pkl')
+RESUMO_S = 30  # intervalo do resumo de métricas no log (nível INFO)
 
 def inicializa_banco():
     conn = sqlite3.connect(DB_FILE)
@@ -66,47 +81,18 @@ def inicializa_banco():
             FOREIGN KEY (id_cultura) REFERENCES Cultura(id_cultura)
         );
     """)
-    # MedidaSolo
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS MedidaSolo (
-            id_medida INTEGER PRIMARY KEY,
-            data_hora DATETIME,
-            valor_umidade DOUBLE,
-            valor_ph DOUBLE,
-            valor_npk VARCHAR(100),
-            temperatura DOUBLE,
-            previsao_chuva VARCHAR(20),
-            crescimento_percentual DOUBLE,
-            id_dispositivo INTEGER,
-            id_talhao INTEGER,
-            FOREIGN KEY (id_dispositivo) REFERENCES DispositivoCampo(id_dispositivo),
-            FOREIGN KEY (id_talhao) REFERENCES TalhaoCacau(id_talhao)
-        );
-    """)
-    # AcaoAgricola
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS AcaoAgricola (
-            id_acao INTEGER PRIMARY KEY,
-            id_medida INTEGER,
-            recomendacao VARCHAR(255),
-            FOREIGN KEY (id_medida) REFERENCES MedidaSolo(id_medida)
-        );
-    """)
-    # HistoricoAcao
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS HistoricoAcao (
-            id_historico INTEGER PRIMARY KEY,
-            id_acao INTEGER,
-            executada BOOLEAN,
-            data_execucao DATETIME,
-            observacao_produtor VARCHAR(255),
-            FOREIGN KEY (id_acao) REFERENCES AcaoAgricola(id_acao)
-        );
-    """)
+    # MedidaSolo (schema e migrações em banco.py)
+    banco.migra_medida_solo(c)
+    # AcaoAgricola e HistoricoAcao (schema e migrações em banco.py; preenchidas por recomendacoes.py)
+    banco.migra_acoes(c)
+    # FeatureMedida (features do modelo, preenchidas na ingestão)
+    features.inicializa_features(c)
+    # EstatisticaDispositivo e AlertaMedida (estatísticas contínuas e alertas por dispositivo)
+    estatisticas.inicializa_estatisticas(c)
     conn.commit()
     conn.close()
 
-def insere_se_necessario():
+def insere_se_necessario(id_dispositivo=1, id_talhao=1):
     """Insere registros padrões em Cultura, DispositivoCampo e TalhaoCacau, se necessário."""
     conn = sqlite3.connect(DB_FILE)
     c = conn.cursor()
@@ -124,6 +110,11 @@ def insere_se_necessario():
     if c.fetchone()[0] == 0:
         c.execute("""INSERT INTO TalhaoCacau (id_talhao, nome, regiao, produtor, id_cultura)
                      VALUES (1, 'Talhão 1', 'Região A', 'Produtor X', 1)""")
+    # Dispositivo e talhão desta coleta (vários coletores podem rodar em paralelo)
+    c.execute("INSERT OR IGNORE INTO DispositivoCampo (id_dispositivo, tipo_sensor, descricao) VALUES (?, 'ESP32', ?)",
+              (id_dispositivo, f"Dispositivo {id_dispositivo}"))
+    c.execute("""INSERT OR IGNORE INTO TalhaoCacau (id_talhao, nome, regiao, produtor, id_cultura)
+                 VALUES (?, ?, 'Região A', 'Produtor X', 1)""", (id_talhao, f"Talhão {id_talhao}"))
     conn.commit()
     conn.close()
 
@@ -133,24 +124,32 @@ def inserir_medida_solo(umidade, ph, fosforo, potassio, sensor1, sensor2,
     """
     Insere uma leitura na tabela MedidaSolo, adaptando dados do ESP32/Wokwi para o MER.
     valor_npk armazena string como 'Fósforo:1,Potássio:0'
+    As features do modelo são gravadas em FeatureMedida na mesma transação.
+    Retorna (id_medida, data_hora_ms, features) da leitura gravada; as features são a
+    tupla gravada em FeatureMedida, na ordem de features.FEATURES.
     """
     valor_npk = f"Fósforo:{int(fosforo)},Potássio:{int(potassio)}"
-    data_hora = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    data_hora_ms = banco.agora_ms()
     conn = sqlite3.connect(DB_FILE)
     c = conn.cursor()
     c.execute("PRAGMA foreign_keys = ON;")
     c.execute("""
         INSERT INTO MedidaSolo (
-            data_hora, valor_umidade, valor_ph, valor_npk,
+            data_hora_ms, valor_umidade, valor_ph, valor_npk,
             temperatura, previsao_chuva, crescimento_percentual,
             id_dispositivo, id_talhao
         ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
     """, (
-        data_hora, umidade, ph, valor_npk, temperatura,
+        data_hora_ms, umidade, ph, valor_npk, temperatura,
         previsao_chuva, crescimento_percentual, id_dispositivo, id_talhao
     ))
+    id_medida = c.lastrowid
+    valores = features.calcula_features(
+        umidade, ph, fosforo, potassio, temperatura, datetime.fromtimestamp(data_hora_ms / 1000))
+    features.insere_features(c, id_medida, valores)
     conn.commit()
     conn.close()
+    return id_medida, data_hora_ms, valores
 
 def parse_serial_line(line):
     pattern = r"Fósforo:\s*(\d)\s*\|\s*Potássio:\s*(\d)\s*\|\s*Umidade:\s*([0-9.]+)\s*\|\s*pH\s*\(sim\):\s*([0-9.]+)\s*\|\s*Relé:\s*(LIGADO|DESLIGADO)"
@@ -164,7 +163,7 @@ def parse_serial_line(line):
     rele = True if m.group(5) == 'LIGADO' else False
     # Pode retornar valores extras (None) para campos não presentes no print
     # sensor1, sensor2, temperatura, etc. podem ser definidos como None aqui
-    return umidade, ph, fosforo, potassio, None, None  # sensor1, sensor2 = None
+    return umidade, ph, fosforo, potassio, None, None, rele  # sensor1, sensor2 = None
 
 #def parse_serial_line(line):
 #    """
@@ -183,53 +182,175 @@ def parse_serial_line(line):
 #    sensor2 = int(m.group(6))
 #    return umidade, ph, fosforo, potassio, sensor1, sensor2
 
+def grava_estado(monitor, t_ms):
+    """Grava estatísticas e alertas pendentes do dispositivo em EstatisticaDispositivo/AlertaMedida."""
+    conn = sqlite3.connect(DB_FILE)
+    monitor.grava(conn.cursor(), t_ms)
+    conn.commit()
+    conn.close()
+
+def carrega_modelo():
+    """Modelo para inferência na coleta (compilado .npz se houver; imports sob demanda)."""
+    return registro_modelos.carrega_modelo()
+
+def _encerra(signum, frame):
+    # SIGTERM (supervisor/menu) encerra como um Ctrl+C
+    raise KeyboardInterrupt
+
 def main():
+    parser = argparse.ArgumentParser(description="Coleta dados do ESP32 via serial e grava em MedidaSolo.")
+    parser.add_argument('--serial', type=str, default=SERIAL_URL, help=f'URL/porta serial (default: {SERIAL_URL})')
+    parser.add_argument('--baudrate', type=int, default=BAUDRATE)
+    parser.add_argument('--dispositivo', type=int, default=1, help='id_dispositivo das medidas (default: 1)')
+    parser.add_argument('--talhao', type=int, default=1, help='id_talhao das medidas (default: 1)')
+    parser.add_argument('--faixas', type=str, default=None,
+                        help='JSON com faixas de alerta que sobrepõem as de estatisticas.FAIXAS')
+    parser.add_argument('--binario', action='store_true',
+                        help='Quadros binários com CRC (ESP32 com MODO_BINARIO; default: linhas de texto)')
+    parser.add_argument('--inferencia', action='store_true',
+                        help='Carrega o modelo e calcula a predição de cada leitura (default: desligado)')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help=f'Endpoint Prometheus em 127.0.0.1 (default: ${metricas.ENV_PORTA}; sem porta, desligado)')
+    parser.add_argument('--log-file', type=str, default=None,
+                        help='Log em arquivo rotacionado e comprimido (default: só console)')
+    parser.add_argument('--log-level', type=str, default=None,
+                        help=f'DEBUG mostra cada linha recebida (default: ${farmtech_logs.ENV_NIVEL} ou INFO)')
+    parser.add_argument('--log-max-bytes', type=int, default=farmtech_logs.MAX_BYTES, help='Tamanho para rotacionar o log')
+    parser.add_argument('--log-backups', type=int, default=farmtech_logs.BACKUPS, help='Arquivos .gz mantidos')
+    args = parser.parse_args()
+    farmtech_logs.configura(args.log_file, args.log_level, max_bytes=args.log_max_bytes, backups=args.log_backups)
+    signal.signal(signal.SIGTERM, _encerra)
+    metricas.inicia(f"coleta-{args.dispositivo}", porta=args.metrics_port, resumo_s=RESUMO_S, logger=log)
+    try:
+        coleta(args)
+    except Exception:
+        log.exception("Coleta interrompida por erro")
+        raise
+    finally:
+        farmtech_logs.encerra()
+
+def coleta(args):
+    etapas = [('imports', _IMPORTS_S)]
+    t = time.perf_counter()
     inicializa_banco()
-    insere_se_necessario()
-    print(f"Conectando ao serial {SERIAL_URL} ...")
-    ser = serial.serial_for_url(SERIAL_URL, baudrate=BAUDRATE, timeout=2)
-    model = joblib.load(MODEL_PATH)
+    insere_se_necessario(args.dispositivo, args.talhao)
+    conn = sqlite3.connect(DB_FILE)
+    monitor = estatisticas.MonitorDispositivo(args.dispositivo, estatisticas.carrega_faixas(args.faixas))
+    monitor.carrega(conn.cursor())
+    conn.close()
+    etapas.append(('banco', time.perf_counter() - t))
+    model = None
+    if args.inferencia:
+        t = time.perf_counter()
+        model = carrega_modelo()
+        etapas.append(('modelo', time.perf_counter() - t))
+    log.info("Conectando ao serial %s ...", args.serial)
+    t = time.perf_counter()
+    ser = serial.serial_for_url(args.serial, baudrate=args.baudrate, timeout=2)
+    etapas.append(('serial', time.perf_counter() - t))
+    log.info("Inicialização em %.0f ms (%s)", sum(s for _, s in etapas) * 1000,
+             ", ".join(f"{nome} {s * 1000:.0f} ms" for nome, s in etapas))
+    inicio_leitura = time.perf_counter()
+    primeira = True
+    debug = log.isEnabledFor(logging.DEBUG)
+
+    def registra(umidade, ph, fosforo, potassio, rele):
+        temperatura = None  # adapte se houver
+        with metricas.cronometro('coleta_insercao'):
+            id_medida, t_ms, valores = inserir_medida_solo(
+                umidade, ph, fosforo, potassio, None, None, temperatura=temperatura,
+                id_dispositivo=args.dispositivo, id_talhao=args.talhao
+            )
+        metricas.incrementa('coleta_leituras')
+        with metricas.cronometro('coleta_estatisticas'):
+            for alerta in monitor.atualiza(id_medida, t_ms, {'valor_umidade': umidade, 'valor_ph': ph, 'rele': rele}):
+                log.warning("Alerta %s/%s no dispositivo %s: valor %.3g, limite %.3g",
+                            alerta[3], alerta[4], args.dispositivo, alerta[5], alerta[6])
+            if monitor.precisa_gravar(t_ms):
+                grava_estado(monitor, t_ms)
+        # ==== INFERÊNCIA ML ====
+        # Só para acompanhamento no log: as recomendações em AcaoAgricola/HistoricoAcao
+        # são geradas em lote, por intervalos, pelo job recomendacoes.py
+        # Agora o modelo é muito analítico, é muito claro qunando irrigar
+        # So faz sentido inferencia se coletar mais dados de resultados da colheita com os dados dos sensores
+        if model is not None:
+            import numpy as np
+            with metricas.cronometro('coleta_inferencia'):
+                # As mesmas features gravadas em FeatureMedida para esta leitura (hora da
+                # gravação, não a atual), em float32 como no treino
+                linha = np.asarray([valores], dtype=np.float32)
+                # Uma linha: o compilado percorre as árvores em Python puro (µs);
+                # predict() vetorizado só compensa em lote
+                if hasattr(model, 'predict_one'):
+                    pred = int(model.predict_one(linha[0]))
+                else:
+                    pred = int(model.predict(linha)[0])
+            if debug:
+                log.debug("pred: %s (medida %s)", pred, id_medida)
+
+    decodificador = telemetria_binaria.DecodificadorQuadros() if args.binario else None
+    outro_dispositivo = set()
     while True:
         try:
-            line = ser.readline().decode("utf-8").strip()
+            if decodificador is not None:
+                # Modo binário: lê tudo o que chegou e decodifica vários quadros por leitura
+                with metricas.cronometro('coleta_leitura_serial'):
+                    bloco = ser.read(ser.in_waiting or 1)
+                if not bloco:
+                    continue
+                descartados, falhas_crc = decodificador.descartados, decodificador.falhas_crc
+                with metricas.cronometro('coleta_parse'):
+                    quadros = decodificador.alimenta(bloco)
+                if decodificador.falhas_crc > falhas_crc:
+                    metricas.incrementa('coleta_quadros_corrompidos', decodificador.falhas_crc - falhas_crc)
+                if decodificador.descartados > descartados:
+                    metricas.incrementa('coleta_bytes_descartados', decodificador.descartados - descartados)
+                for q in quadros:
+                    if primeira:
+                        log.info("Primeiro quadro do serial %.0f ms após abrir a porta", (time.perf_counter() - inicio_leitura) * 1000)
+                        primeira = False
+                    if debug:
+                        log.debug("Recebido: %s", q)
+                    if q.perdidos:
+                        metricas.incrementa('coleta_quadros_perdidos', q.perdidos)
+                        log.warning("Lacuna de %d quadro(s) do dispositivo %s antes da seq %d",
+                                    q.perdidos, q.id_dispositivo, q.seq)
+                    elif q.reinicio:
+                        log.info("Dispositivo %s reiniciou (seq voltou a 0)", q.id_dispositivo)
+                    if q.id_dispositivo != args.dispositivo and q.id_dispositivo not in outro_dispositivo:
+                        outro_dispositivo.add(q.id_dispositivo)
+                        log.warning("Quadros com id_dispositivo %s gravados como --dispositivo %s",
+                                    q.id_dispositivo, args.dispositivo)
+                    if q.umidade is None or q.ph is None:
+                        metricas.incrementa('coleta_invalidas')
+                        continue
+                    registra(q.umidade, q.ph, q.fosforo, q.potassio, q.rele)
+                continue
+            with metricas.cronometro('coleta_leitura_serial'):
+                line = ser.readline().decode("utf-8").strip()
             if not line:
                 continue
-            print("Recebido:", line)
-            data = parse_serial_line(line)
+            if primeira:
+                log.info("Primeira linha do serial %.0f ms após abrir a porta", (time.perf_counter() - inicio_leitura) * 1000)
+                primeira = False
+            if debug:
+                log.debug("Recebido: %s", line)
+            with metricas.cronometro('coleta_parse'):
+                data = parse_serial_line(line)
             if data:
-                umidade, ph, fosforo, potassio, *_ = data
-                temperatura = None  # adapte se houver
-                inserir_medida_solo(
-                    umidade, ph, fosforo, potassio, None, None, temperatura=temperatura
-                )
-                # ==== INFERÊNCIA ML ====
-                # Para desenvolvimento futuro quando o ML vai dizer quando irrigar
-                # Colocar em uma nova  tabela, não em AcaoAgricola
-                # Agora o modelo é muito analítico, é muito claro qunando irrigar
-                # So faz sentido inferencia se coletar mais dados de resultados da colheita com os dados dos sensores
-
-                #now = pd.to_datetime(datetime.now())
-                #features = pd.DataFrame([[umidade, ph, int(fosforo), int(potassio), temperatura or 0, now.hour, now.weekday()]],
-                #                        columns=['valor_umidade', 'valor_ph', 'fosforo', 'potassio', 'temperatura', 'hour', 'weekday'])
-                #pred = int(model.predict(features)[0])
-                #print(f"pred: {model.predict(features)}")
-                ## Registre a recomendação do modelo
-                #conn = sqlite3.connect(DB_FILE)
-                #c = conn.cursor()
-                #c.execute("SELECT last_insert_rowid()")
-                #idm = c.fetchone()[0]
-                #c.execute("INSERT INTO AcaoAgricola (id_medida, recomendacao) VALUES (?, ?)", (idm, str(pred)))
-                #conn.commit()
-                #conn.close()
-                #print(f">> Medida e recomendação ML ({pred}) inseridas.")
-
+                umidade, ph, fosforo, potassio, _, _, rele = data
+                registra(umidade, ph, fosforo, potassio, rele)
             else:
-                print(">> Linha não reconhecida/formato inválido.")
+                metricas.incrementa('coleta_invalidas')
+                if debug:
+                    log.debug(">> Linha não reconhecida/formato inválido: %s", line)
         except KeyboardInterrupt:
-            print("Parado pelo usuário.")
+            grava_estado(monitor, banco.agora_ms())
+            log.info("Parado pelo usuário.")
             break
         except Exception as e:
-            print("Erro:", e)
+            metricas.incrementa('coleta_erros')
+            log.error("Erro: %s", e)
             continue
 
 if __name__ == "__main__":
@@ -10,50 +10,69 @@ Dashboard web com Dash para visualização dos dados da tabela MedidaSolo do ban
 - Mostra tabela de leituras, incluindo fósforo, potássio e estado do relé
 - Gráficos de umidade, fósforo, potássio, pH e relé ao longo do tempo
 - Gráfico do relé no estilo "step"/automação SCADA
+- Estado por dispositivo (médias, desvio, taxa, ciclo do relé) e alertas, calculados na coleta
 - Atualização automática
-- Abre o navegador padrão automaticamente
+- Resultado das consultas e figuras em cache compartilhado (cache_resultados.py), chaveado pelo
+  MAX(id_medida) e pelo estado dos alertas: N clientes/workers custam uma consulta por atualização
+- Produção: app WSGI `server` para servidores com vários workers (ex.: gunicorn)
+- Desenvolvimento (`./farmtech_dashboard.py`): servidor do Dash e abre o navegador padrão
+
+Uso:
+    ./farmtech_dashboard.py [--porta 8050] [--sem-navegador]
+    gunicorn -w 4 -b 127.0.0.1:8050 --chdir backend farmtech_dashboard:server
 
 Licença: MIT
 """
 
+import argparse
+import os
 import sqlite3
+import logging
 import pandas as pd
 from dash import Dash, html, dcc, dash_table
 from dash.dependencies import Input, Output
 import plotly.express as px
 import plotly.graph_objects as go
-import re
 import webbrowser
 import threading
 import time
+import features
+import banco
+import estatisticas
+import farmtech_logs
+import metricas
+import cache_resultados
 
-DB_FILE = 'farm_data.db'
+DB_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../farm_data.db')
 DASH_PORT = 8050
+RESUMO_S = 60
+
+cache = cache_resultados.CacheResultados()
+
+log = logging.getLogger('farmtech.dashboard')
 
 def load_medidas():
-    """Carrega todas as medições da tabela MedidaSolo em um DataFrame e extrai Fósforo, Potássio e Relé."""
+    """Carrega todas as medições da tabela MedidaSolo em um DataFrame, com Fósforo/Potássio de FeatureMedida e Relé."""
 
     conn = sqlite3.connect(DB_FILE)
-    df = pd.read_sql_query("""
-        SELECT m.id_medida, m.data_hora, m.valor_umidade, m.valor_ph, m.valor_npk,
-               m.temperatura, m.previsao_chuva, m.crescimento_percentual,
-               d.tipo_sensor, t.nome AS talhao
-        FROM MedidaSolo m
-        LEFT JOIN DispositivoCampo d ON m.id_dispositivo = d.id_dispositivo
-        LEFT JOIN TalhaoCacau t ON m.id_talhao = t.id_talhao
-        ORDER BY m.data_hora DESC
-    """, conn)
+    banco.migra_medida_solo(conn.cursor())
+    with metricas.cronometro('dashboard_backfill'):
+        features.backfill(conn, completo=False)
+    with metricas.cronometro('dashboard_consulta_db'):
+        df = pd.read_sql_query("""
+            SELECT m.id_medida, m.data_hora_ms, m.valor_umidade, m.valor_ph, m.valor_npk,
+                   m.temperatura, m.previsao_chuva, m.crescimento_percentual,
+                   d.tipo_sensor, t.nome AS talhao,
+                   CAST(f.fosforo AS INTEGER) AS fosforo, CAST(f.potassio AS INTEGER) AS potassio
+            FROM MedidaSolo m
+            LEFT JOIN FeatureMedida f ON m.id_medida = f.id_medida
+            LEFT JOIN DispositivoCampo d ON m.id_dispositivo = d.id_dispositivo
+            LEFT JOIN TalhaoCacau t ON m.id_talhao = t.id_talhao
+            ORDER BY m.data_hora_ms DESC
+        """, conn)
     conn.close()
+    df.insert(1, 'data_hora', banco.ms_para_datetime(df.pop('data_hora_ms')))
 
-    # Extrai fósforo, potássio (0 ou 1) de valor_npk
-    def extrai_npk(valor_npk, qual):
-        if isinstance(valor_npk, str):
-            m = re.search(rf"{qual}:(\d)", valor_npk)
-            if m:
-                return int(m.group(1))
-        return None
-    df['fosforo'] = df['valor_npk'].apply(lambda x: extrai_npk(x, 'Fósforo'))
-    df['potassio'] = df['valor_npk'].apply(lambda x: extrai_npk(x, 'Potássio'))
     # Estado do relé: espera coluna 'rele' ou pode simular (ajuste conforme seu banco)
     if 'rele' in df.columns:
         df['rele_state'] = df['rele'].map(lambda x: 1 if str(x).upper() in ['1','TRUE','LIGADO'] else 0)
@@ -63,8 +82,47 @@ def load_medidas():
         df['rele_state'] = 0
     return df
 
+def load_estado():
+    """Estatísticas contínuas e alertas gravados pelo coletor (tabelas pequenas)."""
+    conn = sqlite3.connect(DB_FILE)
+    with metricas.cronometro('dashboard_consulta_estado'):
+        estado, alertas = estatisticas.le_estado(conn)
+    conn.close()
+    estado = estado[['dispositivo', 'variavel', 'n', 'ultimo_valor', 'media', 'desvio', 'minimo', 'maximo',
+                     'ewma', 'taxa_min', 'atualizado']]
+    return estado.astype({'atualizado': str}).round(3), alertas.astype({'data_hora': str}).round(3)
+
+def versao_dados():
+    """Muda quando chega medida nova ou o coletor grava estado/alertas (consulta por índice, barata)."""
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        return ":".join(str(v) for v in conn.execute("""
+            SELECT (SELECT MAX(id_medida) FROM MedidaSolo),
+                   (SELECT MAX(ultimo_ms) FROM EstatisticaDispositivo),
+                   (SELECT MAX(id_alerta) FROM AlertaMedida)
+        """).fetchone())
+    except sqlite3.OperationalError:
+        return None  # banco novo: tabelas criadas na primeira carga
+    finally:
+        conn.close()
+
+_logs_configurados = False
+_logs_lock = threading.Lock()
+
+def instrumentacao():
+    # Uma vez por processo, também nos workers WSGI: logging primeiro (como no coletor e no
+    # serviço de predição), para que as mensagens do endpoint e do profiler não se percam;
+    # depois resumo de métricas, endpoint e profiler
+    global _logs_configurados
+    with _logs_lock:
+        if not _logs_configurados:
+            farmtech_logs.configura()
+            _logs_configurados = True
+    metricas.inicia('dashboard', resumo_s=RESUMO_S, logger=log)
+
 app = Dash(__name__)
 app.title = "Farm Dashboard - Tech Farm Solutions"
+server = app.server  # WSGI
 
 app.layout = html.Div([
     html.H1("Farm Dashboard - Tech Farm Solutions MEM", style={"textAlign": "center"}),
@@ -94,6 +152,21 @@ app.layout = html.Div([
         ],
 
     ),
+    html.H2("Estado por Dispositivo"),
+    dash_table.DataTable(
+        id='tabela-estado',
+        style_table={'overflowX': 'auto'},
+        style_cell={'textAlign': 'center', 'fontFamily': 'Arial', 'padding': '5px'},
+        style_header={'backgroundColor': '#003366', 'color': 'white', 'fontWeight': 'bold'},
+    ),
+    html.H2("Alertas Recentes"),
+    dash_table.DataTable(
+        id='tabela-alertas',
+        page_size=10,
+        style_table={'overflowX': 'auto'},
+        style_cell={'textAlign': 'center', 'fontFamily': 'Arial', 'padding': '5px'},
+        style_header={'backgroundColor': '#770000', 'color': 'white', 'fontWeight': 'bold'},
+    ),
     html.Br(),
     html.Div([
         html.Div([
@@ -125,12 +198,25 @@ app.layout = html.Div([
     Output('grafico-potassio', 'figure'),
     Output('grafico-ph', 'figure'),
     Output('grafico-rele', 'figure'),
+    Output('tabela-estado', 'data'),
+    Output('tabela-estado', 'columns'),
+    Output('tabela-alertas', 'data'),
+    Output('tabela-alertas', 'columns'),
     Input('interval', 'n_intervals')
 )
 def update_dashboard(n):
+    instrumentacao()
+    versao = versao_dados()
+    if versao is None:
+        return monta_painel()
+    return cache.obtem('dashboard', versao, monta_painel)
+
+def monta_painel():
+    """Consultas e figuras do painel (calculado uma vez por versão dos dados, ver update_dashboard)."""
     df = load_medidas()
     tabela = df.head(20).to_dict("records")
     df_sorted = df.sort_values("data_hora")
+    t_figura = time.perf_counter()
     # Umidade
     fig_umidade = px.line(df_sorted, x="data_hora", y="valor_umidade", 
                           title="Umidade do Solo ao Longo do Tempo",
@@ -172,12 +258,24 @@ def update_dashboard(n):
     )
     for fig in [fig_umidade, fig_fosforo, fig_potassio, fig_ph]:
         fig.update_layout(xaxis_tickangle=-45)
-    return tabela, fig_umidade, fig_fosforo, fig_potassio, fig_ph, fig_rele
+    metricas.observa('dashboard_figura', time.perf_counter() - t_figura)
+    estado, alertas = load_estado()
+    return (tabela, fig_umidade, fig_fosforo, fig_potassio, fig_ph, fig_rele,
+            estado.to_dict("records"), [{"name": i, "id": i} for i in estado.columns],
+            alertas.to_dict("records"), [{"name": i, "id": i} for i in alertas.columns])
 
 def open_browser():
     time.sleep(1)
     webbrowser.open(f"http://localhost:{DASH_PORT}")
 
 if __name__ == '__main__':
-    threading.Thread(target=open_browser).start()
-    app.run(debug=False, port=DASH_PORT)
+    parser = argparse.ArgumentParser(description="Dashboard Dash (servidor de desenvolvimento; em produção use o WSGI `server`).")
+    parser.add_argument('--porta', type=int, default=DASH_PORT, help=f'Porta (default: {DASH_PORT})')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Endereço (default: 127.0.0.1)')
+    parser.add_argument('--sem-navegador', action='store_true', help='Não abre o navegador')
+    args = parser.parse_args()
+    DASH_PORT = args.porta
+    instrumentacao()
+    if not args.sem_navegador:
+        threading.Thread(target=open_browser).start()
+    app.run(debug=False, host=args.host, port=args.porta)
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+farmtech_logs.py
+Author: Mário (DevOps/SRE)
+Version: 1.0
+Date: 2026-10-19
+
+Log da coleta de dados com custo baixo mesmo com muitas linhas por segundo.
+- configura(): logging com fila; a escrita em disco roda em outra thread, em lotes
+- Arquivo rotacionado por tamanho; arquivos antigos comprimidos (.1.gz, .2.gz, ...)
+- Verbosidade configurável (--log-level ou FARMTECH_LOG_LEVEL)
+- segue(): tail -f orientado a eventos (watchdog), que acompanha as rotações
+- CopiaSaida: saída bruta (pipe) de um processo filho no mesmo arquivo rotacionado (supervisor)
+
+Licença: MIT
+"""
+
+import codecs
+import gzip
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import sys
+import threading
+
+ENV_NIVEL = 'FARMTECH_LOG_LEVEL'
+FORMATO = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+MAX_BYTES = 5 * 1024 * 1024
+BACKUPS = 5
+LOTE_MAX = 1000
+
+
+class ArquivoRotativoGzip(logging.handlers.RotatingFileHandler):
+    """RotatingFileHandler que comprime os arquivos rotacionados e grava em lotes."""
+
+    def __init__(self, arquivo, max_bytes=MAX_BYTES, backups=BACKUPS):
+        super().__init__(arquivo, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+        self.namer = lambda nome: nome + '.gz'
+        self.rotator = self._comprime
+
+    @staticmethod
+    def _comprime(origem, destino):
+        with open(origem, 'rb') as f_in, gzip.open(destino, 'wb') as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        os.remove(origem)
+
+    def emite_lote(self, registros):
+        """Formata e grava vários registros com um único write/flush."""
+        self.escreve(''.join(self.format(r) + self.terminator for r in registros))
+
+    def escreve(self, texto):
+        """Grava texto já pronto, rotacionando antes se ele passar do limite."""
+        with self.lock:
+            if self.stream is None:
+                self.stream = self._open()
+            if self.maxBytes and self.stream.tell() + len(texto) >= self.maxBytes and self.stream.tell() > 0:
+                self.doRollover()
+            self.stream.write(texto)
+            self.stream.flush()
+
+
+class _EscritorEmLote(threading.Thread):
+    """Consome a fila de registros e entrega ao handler de arquivo em lotes."""
+
+    def __init__(self, fila, handler):
+        super().__init__(name='farmtech-log', daemon=True)
+        self.fila = fila
+        self.handler = handler
+
+    def run(self):
+        while True:
+            registro = self.fila.get()
+            if registro is None:
+                return
+            lote = [registro]
+            try:
+                while len(lote) < LOTE_MAX:
+                    registro = self.fila.get_nowait()
+                    if registro is None:
+                        self.handler.emite_lote(lote)
+                        return
+                    lote.append(registro)
+            except queue.Empty:
+                pass
+            self.handler.emite_lote(lote)
+
+    def para(self):
+        self.fila.put(None)
+        self.join(timeout=5)
+        self.handler.close()
+
+
+class CopiaSaida(threading.Thread):
+    """Copia um pipe (stdout/stderr de um filho) para um ArquivoRotativoGzip, em blocos, até o EOF."""
+
+    def __init__(self, pipe, arquivo, max_bytes=MAX_BYTES, backups=BACKUPS):
+        super().__init__(name=f'farmtech-saida-{os.path.basename(arquivo)}', daemon=True)
+        self.pipe = pipe
+        os.makedirs(os.path.dirname(os.path.abspath(arquivo)), exist_ok=True)
+        self.handler = ArquivoRotativoGzip(arquivo, max_bytes=max_bytes, backups=backups)
+
+    def run(self):
+        decodifica = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        fd = self.pipe.fileno()
+        resto = ''
+        try:
+            while bloco := os.read(fd, 65536):
+                # Só linhas completas: a rotação nunca parte uma linha entre dois arquivos
+                texto = resto + decodifica.decode(bloco)
+                corte = texto.rfind('\n') + 1
+                if corte:
+                    self.handler.escreve(texto[:corte])
+                resto = texto[corte:]
+            resto += decodifica.decode(b'', final=True)
+            if resto:
+                self.handler.escreve(resto)
+        finally:
+            self.pipe.close()
+            self.handler.close()
+
+
+_escritor = None
+
+
+def nivel_padrao(nivel=None):
+    return (nivel or os.environ.get(ENV_NIVEL) or 'INFO').upper()
+
+
+def configura(arquivo=None, nivel=None, nivel_console=None, max_bytes=MAX_BYTES, backups=BACKUPS):
+    """
+    Configura o logger raiz.
+    - arquivo: log rotacionado/comprimido (escrito em lotes por uma thread própria)
+    - nivel: nível geral (default: FARMTECH_LOG_LEVEL ou INFO)
+    - nivel_console: nível no stdout (default: WARNING com arquivo, senão o nível geral)
+    """
+    global _escritor
+    nivel = nivel_padrao(nivel)
+    raiz = logging.getLogger()
+    for h in list(raiz.handlers):
+        raiz.removeHandler(h)
+    raiz.setLevel(nivel)
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter(FORMATO))
+    console.setLevel((nivel_console or ('WARNING' if arquivo else nivel)).upper())
+    raiz.addHandler(console)
+
+    if arquivo:
+        os.makedirs(os.path.dirname(os.path.abspath(arquivo)), exist_ok=True)
+        handler = ArquivoRotativoGzip(arquivo, max_bytes=max_bytes, backups=backups)
+        handler.setFormatter(logging.Formatter(FORMATO))
+        fila = queue.SimpleQueue()
+        raiz.addHandler(logging.handlers.QueueHandler(fila))
+        _escritor = _EscritorEmLote(fila, handler)
+        _escritor.start()
+    return raiz
+
+
+def encerra():
+    """Descarrega a fila de log pendente (chamar antes de sair)."""
+    global _escritor
+    if _escritor is not None:
+        _escritor.para()
+        _escritor = None
+
+
+def _ultimas_linhas(caminho, n):
+    with open(caminho, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(f.tell() - 64 * 1024, 0), os.SEEK_SET)
+        return [linha.decode('utf-8', errors='replace') for linha in f.readlines()[-n:]]
+
+
+def segue(caminho, n=20, saida=None):
+    """
+    Mostra as últimas n linhas e segue o arquivo (como tail -F), acordando só
+    quando o watchdog avisa que o diretório mudou. Reabre o arquivo quando ele
+    é rotacionado (inode novo ou tamanho menor que a posição lida).
+    """
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+
+    saida = saida or sys.stdout
+    caminho = os.path.abspath(caminho)
+    mudou = threading.Event()
+
+    class _Avisa(FileSystemEventHandler):
+        def on_any_event(self, event):
+            caminhos = {getattr(event, 'src_path', None), getattr(event, 'dest_path', None)}
+            if caminho in caminhos:
+                mudou.set()
+
+    for linha in _ultimas_linhas(caminho, n):
+        saida.write(linha)
+    saida.flush()
+
+    observer = Observer()
+    observer.schedule(_Avisa(), os.path.dirname(caminho), recursive=False)
+    observer.start()
+    f = open(caminho, 'rb')
+    f.seek(0, os.SEEK_END)
+    inode = os.fstat(f.fileno()).st_ino
+    try:
+        while True:
+            mudou.wait(timeout=5)
+            mudou.clear()
+            dados = f.read()
+            if dados:
+                saida.write(dados.decode('utf-8', errors='replace'))
+                saida.flush()
+            try:
+                st = os.stat(caminho)
+            except FileNotFoundError:
+                continue  # rotação em andamento; o arquivo novo gera outro evento
+            if st.st_ino != inode or st.st_size < f.tell():
+                # O que foi escrito entre a leitura acima e a rotação continua legível
+                # pelo descritor aberto, mesmo depois de o arquivo ser comprimido e removido
+                resto = f.read()
+                if resto:
+                    saida.write(resto.decode('utf-8', errors='replace'))
+                    saida.flush()
+                f.close()
+                f = open(caminho, 'rb')
+                inode = os.fstat(f.fileno()).st_ino
+                mudou.set()
+    finally:
+        f.close()
+        observer.stop()
+        observer.join()
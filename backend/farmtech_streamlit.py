@@ -9,40 +9,87 @@ Date: 2025-05-20
 """
 
 import os
+import time
+import logging
 import streamlit as st
 import pandas as pd
 import sqlite3
-import joblib
 from datetime import datetime, timedelta
 import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
+import registro_modelos
+import features
+import banco
+import estatisticas
+import farmtech_logs
+import metricas
 
-MODEL_PATH = os.path.join(os.path.dirname(__file__), 'models/ml_irrigacao.pkl')
 DB_FILE = os.path.join(os.path.dirname(__file__), '../farm_data.db')
+RESUMO_S = 60
+
+log = logging.getLogger('farmtech.streamlit')
+
+@st.cache_resource
+def instrumentacao():
+    # Uma vez por processo: log, resumo de métricas, endpoint (FARMTECH_METRICS_PORT) e profiler
+    farmtech_logs.configura()
+    metricas.inicia('streamlit', resumo_s=RESUMO_S, logger=log)
+
+instrumentacao()
 
 st.title("FarmTech Solutions – Dashboard Inteligente de Irrigação")
 
 @st.cache_data(ttl=60)
-def load_data():
+def load_data(horas=None):
+    """Medidas com features; o filtro de tempo vai para o SQL (índice em data_hora_ms)."""
     conn = sqlite3.connect(DB_FILE)
-    df = pd.read_sql("""
-        SELECT m.data_hora, m.valor_umidade, m.valor_ph, m.valor_npk, m.temperatura
-        FROM MedidaSolo m
-        ORDER BY m.data_hora DESC
-    """, conn, parse_dates=["data_hora"])
+    banco.migra_medida_solo(conn.cursor())
+    with metricas.cronometro('dashboard_backfill'):
+        features.backfill(conn, completo=False)
+    filtro, params = "", ()
+    if horas is not None:
+        filtro, params = "WHERE m.data_hora_ms >= ?", (banco.agora_ms() - horas * 3600 * 1000,)
+    with metricas.cronometro('dashboard_consulta_db'):
+        df = pd.read_sql(f"""
+            SELECT m.data_hora_ms, {features.SELECT_FEATURES}
+            FROM MedidaSolo m
+            JOIN FeatureMedida f ON f.id_medida = m.id_medida
+            {filtro}
+            ORDER BY m.data_hora_ms DESC
+        """, conn, params=params)
     conn.close()
-    df['fosforo'] = df['valor_npk'].str.extract(r"Fósforo:(\d)").astype(float)
-    df['potassio'] = df['valor_npk'].str.extract(r"Potássio:(\d)").astype(float)
-    df['hour'] = df['data_hora'].dt.hour
-    df['weekday'] = df['data_hora'].dt.weekday
+    df.insert(0, 'data_hora', banco.ms_para_datetime(df.pop('data_hora_ms')))
+    df[features.FEATURES] = df[features.FEATURES].astype('float32')
     return df
 
-df = load_data()
-model = joblib.load(MODEL_PATH)
+@st.cache_data(ttl=5)
+def load_estado():
+    """Estatísticas contínuas e alertas gravados pelo coletor (sem varrer MedidaSolo)."""
+    conn = sqlite3.connect(DB_FILE)
+    with metricas.cronometro('dashboard_consulta_estado'):
+        estado, alertas = estatisticas.le_estado(conn)
+    conn.close()
+    return estado, alertas
 
-features = df[['valor_umidade', 'valor_ph', 'fosforo', 'potassio', 'temperatura', 'hour', 'weekday']].fillna(0)
-df['ml_predicao'] = model.predict(features)
+@st.cache_resource
+def load_model(versao):
+    # Prefere o modelo compilado (somente NumPy); cai para o pickle do sklearn
+    return registro_modelos.carrega_modelo(versao)
+
+model = load_model(registro_modelos.resolve_versao())
+
+# --- Estado por dispositivo (estatísticas contínuas da coleta) e alertas
+st.subheader("Estado dos sensores por dispositivo")
+estado, alertas = load_estado()
+if estado.empty:
+    st.caption("Sem estatísticas ainda: inicie a coleta ou execute `./estatisticas.py --recalcula`.")
+else:
+    st.dataframe(estado[['dispositivo', 'variavel', 'n', 'ultimo_valor', 'media', 'desvio', 'minimo', 'maximo',
+                         'ewma', 'taxa_min', 'atualizado']], hide_index=True)
+if not alertas.empty:
+    st.warning(f"{len(alertas)} alertas recentes")
+    st.dataframe(alertas, hide_index=True)
 
 # --- Filtro temporal (opcional)
 st.subheader("Filtro temporal (opcional)")
@@ -60,15 +107,16 @@ escolha = st.selectbox(
     list(opcoes.keys()),
     index=4
 )
-if opcoes[escolha] is not None:
-    inicio = datetime.now() - timedelta(hours=opcoes[escolha])
-    df_filtrado = df[df['data_hora'] >= inicio]
-else:
-    df_filtrado = df.copy()
+df_filtrado = load_data(opcoes[escolha])
+with metricas.cronometro('dashboard_features'):
+    X = features.matriz(df_filtrado)
+with metricas.cronometro('dashboard_inferencia'):
+    df_filtrado['ml_predicao'] = model.predict(X)
 st.write(f"Mostrando dados para: **{escolha}**")
 
 # --- GRÁFICO: Sensores Coletados (Plotly interativo com range slider) ---
 st.subheader("Histórico dos sensores (interativo)")
+t_figura = time.perf_counter()
 fig_sensores = go.Figure()
 fig_sensores.add_trace(go.Scatter(
     x=df_filtrado['data_hora'], y=df_filtrado['valor_umidade'], name="Umidade", mode="lines+markers"
@@ -101,10 +149,12 @@ fig_sensores.update_layout(
         type="date"
     )
 )
+metricas.observa('dashboard_figura', time.perf_counter() - t_figura)
 st.plotly_chart(fig_sensores, use_container_width=True)
 
 # --- GRÁFICO: Predição ML nos dados coletados (Plotly interativo com range slider) ---
 st.subheader("Previsão ML de irrigação nos dados coletados (interativo)")
+t_figura = time.perf_counter()
 fig_pred = px.line(df_filtrado, x='data_hora', y='ml_predicao', markers=True, title="Predição ML de Irrigação")
 fig_pred.update_layout(
     xaxis_title="Data/Hora",
@@ -124,6 +174,7 @@ fig_pred.update_layout(
         type="date"
     )
 )
+metricas.observa('dashboard_figura', time.perf_counter() - t_figura)
 st.plotly_chart(fig_pred, use_container_width=True)
 
 st.dataframe(df_filtrado[['data_hora','valor_umidade','valor_ph','fosforo','potassio','ml_predicao']].head(30))
@@ -156,9 +207,11 @@ if not df_filtrado.empty:
                 'potassio': last['potassio'],
                 'temperatura': last['temperatura']
             })
-    df_future = pd.DataFrame(future_rows)
-    features_future = df_future[['valor_umidade', 'valor_ph', 'fosforo', 'potassio', 'temperatura', 'hour', 'weekday']].fillna(0)
-    df_future['previsto_irrigar'] = model.predict(features_future)
+    with metricas.cronometro('dashboard_features'):
+        df_future = pd.DataFrame(future_rows)
+        X_future = features.matriz(df_future)
+    with metricas.cronometro('dashboard_inferencia'):
+        df_future['previsto_irrigar'] = model.predict(X_future)
 
     def periodo(h):
         if 0 <= h < 6: return "Madrugada"
@@ -179,6 +232,7 @@ if not df_filtrado.empty:
     st.write(melhores.value_counts().rename_axis('Período').reset_index(name='Dias em destaque'))
 
     st.subheader("Evolução da previsão de irrigação por período (interativo)")
+    t_figura = time.perf_counter()
     fig_future = go.Figure()
     for periodo_nome in resumo['periodo'].unique():
         fig_future.add_trace(go.Scatter(
@@ -205,6 +259,7 @@ if not df_filtrado.empty:
             type="date"
         )
     )
+    metricas.observa('dashboard_figura', time.perf_counter() - t_figura)
     st.plotly_chart(fig_future, use_container_width=True)
 
     with st.expander("Ver detalhes das previsões futuras (hora a hora)"):
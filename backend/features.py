@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+features.py
+Author: Mário (DevOps/SRE)
+Version: 1.0
+Date: 2026-10-19
+
+Tabela de features do modelo de irrigação (FeatureMedida), chaveada por id_medida.
+- Preenchida na ingestão (farmtech_coleta_dados.py) e por backfill (este script)
+- Mesma definição para treino e inferência: sem regex/datetime a cada carga
+- Nulos já gravados como 0 (equivalente ao fillna(0) do treino)
+
+Uso:
+    ./features.py            # backfill das medidas ainda sem features
+    ./features.py --db outro.db
+
+Licença: MIT
+"""
+
+import argparse
+import math
+import os
+import sqlite3
+import banco
+
+DB_FILE = os.path.join(os.path.dirname(__file__), '../farm_data.db')
+
+# Ordem das colunas da matriz de features (a mesma usada no treino do modelo)
+FEATURES = ['valor_umidade', 'valor_ph', 'fosforo', 'potassio', 'temperatura', 'hour', 'weekday']
+
+# Colunas de FeatureMedida para usar em SELECTs com alias "f"
+SELECT_FEATURES = ", ".join(f"f.{col}" for col in FEATURES)
+
+
+def inicializa_features(c, tabela="FeatureMedida"):
+    c.execute(f"""
+        CREATE TABLE IF NOT EXISTS {tabela} (
+            id_medida INTEGER PRIMARY KEY,
+            valor_umidade REAL NOT NULL,
+            valor_ph REAL NOT NULL,
+            fosforo REAL NOT NULL,
+            potassio REAL NOT NULL,
+            temperatura REAL NOT NULL,
+            hour INTEGER NOT NULL,
+            weekday INTEGER NOT NULL,
+            FOREIGN KEY (id_medida) REFERENCES MedidaSolo(id_medida)
+        );
+    """)
+
+
+def _valor(v):
+    return 0.0 if v is None or (isinstance(v, float) and math.isnan(v)) else float(v)
+
+
+def calcula_features(umidade, ph, fosforo, potassio, temperatura, data_hora):
+    """Tupla de features de uma leitura, na ordem de FEATURES (data_hora é um datetime local)."""
+    return (
+        _valor(umidade), _valor(ph), _valor(fosforo), _valor(potassio), _valor(temperatura),
+        data_hora.hour, data_hora.weekday(),
+    )
+
+
+def vetor_features(*args, **kwargs):
+    """calcula_features() como vetor float32 (1, n_features), pronto para predict."""
+    import numpy as np
+    return np.asarray([calcula_features(*args, **kwargs)], dtype=np.float32)
+
+
+def insere_features(c, id_medida, valores):
+    c.execute(
+        f"INSERT OR REPLACE INTO FeatureMedida (id_medida, {', '.join(FEATURES)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (id_medida, *valores))
+
+
+def backfill(conn, completo=True):
+    """
+    Calcula em SQL as features das medidas que ainda não estão em FeatureMedida.
+    completo=False só olha ids acima do maior já calculado (barato, para leitores);
+    completo=True procura buracos em toda a tabela.
+    Retorna o número de linhas inseridas.
+    """
+    c = conn.cursor()
+    inicializa_features(c)
+    if completo:
+        filtro = "WHERE NOT EXISTS (SELECT 1 FROM FeatureMedida f WHERE f.id_medida = m.id_medida)"
+        params = ()
+    else:
+        filtro = "WHERE m.id_medida > ?"
+        params = (c.execute("SELECT COALESCE(MAX(id_medida), 0) FROM FeatureMedida").fetchone()[0],)
+    # strftime('%w') tem domingo = 0; pandas/datetime.weekday() tem segunda = 0
+    c.execute(f"""
+        INSERT OR IGNORE INTO FeatureMedida (id_medida, {', '.join(FEATURES)})
+        SELECT m.id_medida,
+               COALESCE(m.valor_umidade, 0),
+               COALESCE(m.valor_ph, 0),
+               CASE WHEN instr(m.valor_npk, 'Fósforo:') > 0
+                    THEN CAST(substr(m.valor_npk, instr(m.valor_npk, 'Fósforo:') + 8, 1) AS REAL) ELSE 0 END,
+               CASE WHEN instr(m.valor_npk, 'Potássio:') > 0
+                    THEN CAST(substr(m.valor_npk, instr(m.valor_npk, 'Potássio:') + 9, 1) AS REAL) ELSE 0 END,
+               COALESCE(m.temperatura, 0),
+               COALESCE(CAST(strftime('%H', {banco.SQL_LOCALTIME}) AS INTEGER), 0),
+               COALESCE((CAST(strftime('%w', {banco.SQL_LOCALTIME}) AS INTEGER) + 6) % 7, 0)
+        FROM MedidaSolo m
+        {filtro}
+    """, params)
+    inseridas = c.rowcount
+    conn.commit()
+    return inseridas
+
+
+def matriz(df):
+    """Matriz float32 (n, n_features) a partir das colunas FEATURES de um DataFrame."""
+    import numpy as np
+    return df[FEATURES].to_numpy(dtype=np.float32)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill da tabela de features FeatureMedida.")
+    parser.add_argument('--db', type=str, default=DB_FILE, help='Caminho do banco SQLite')
+    args = parser.parse_args()
+    conn = sqlite3.connect(args.db)
+    banco.migra_medida_solo(conn.cursor())
+    n = backfill(conn, completo=True)
+    conn.close()
+    print(f"{n} medidas com features calculadas em {args.db}.")
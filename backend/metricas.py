@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+metricas.py
+Author: Mário (DevOps/SRE)
+Version: 1.0
+Date: 2026-10-19
+
+Instrumentação leve para o coletor e os dashboards.
+- Contadores e histogramas de latência em memória (thread-safe)
+- cronometro("nome"): mede um trecho de código e registra no histograma
+- Endpoint HTTP só em loopback, formato texto do Prometheus: GET /metrics
+- Resumo periódico no log (contagens, taxa, média, p50/p99 da janela)
+- Profiler por amostragem ligado por variável de ambiente; grava stacks no
+  formato "folded" (flamegraph.pl, speedscope) periodicamente e no SIGUSR1
+
+Variáveis de ambiente:
+    FARMTECH_METRICS_PORT=9101        porta do endpoint (se o processo não receber outra)
+    FARMTECH_PROFILE=1                liga o profiler
+    FARMTECH_PROFILE_HZ=100           amostras por segundo
+    FARMTECH_PROFILE_S=60             intervalo entre dumps
+    FARMTECH_PROFILE_DIR=logs/profile diretório dos dumps
+
+Uso:
+    curl -s http://127.0.0.1:9101/metrics
+
+Licença: MIT
+"""
+
+import bisect
+import collections
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ENV_PORTA = 'FARMTECH_METRICS_PORT'
+ENV_PROFILE = 'FARMTECH_PROFILE'
+ENV_PROFILE_HZ = 'FARMTECH_PROFILE_HZ'
+ENV_PROFILE_S = 'FARMTECH_PROFILE_S'
+ENV_PROFILE_DIR = 'FARMTECH_PROFILE_DIR'
+PROFILE_DIR = os.path.join(os.path.dirname(__file__), 'logs/profile')
+PREFIXO = 'farmtech_'
+
+# Limites dos buckets em segundos (50 µs a 10 s)
+BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+           0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+log = logging.getLogger('farmtech.metricas')
+_lock = threading.Lock()
+_contadores = collections.defaultdict(int)
+_histogramas = {}
+_janela = {'t': time.monotonic(), 'contadores': {}, 'histogramas': {}}
+_iniciado = set()
+
+
+class _Histograma:
+    __slots__ = ('baldes', 'soma', 'n')
+
+    def __init__(self):
+        self.baldes = [0] * (len(BUCKETS) + 1)  # último = +Inf
+        self.soma = 0.0
+        self.n = 0
+
+
+def incrementa(nome, n=1):
+    with _lock:
+        _contadores[nome] += n
+
+
+def observa(nome, segundos):
+    i = bisect.bisect_left(BUCKETS, segundos)
+    with _lock:
+        h = _histogramas.get(nome)
+        if h is None:
+            h = _histogramas[nome] = _Histograma()
+        h.baldes[i] += 1
+        h.soma += segundos
+        h.n += 1
+
+
+@contextmanager
+def cronometro(nome):
+    """Mede o bloco e registra a duração no histograma `nome`."""
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        observa(nome, time.perf_counter() - t)
+
+
+def _quantil(baldes, n, q):
+    """Limite superior do bucket que contém o quantil q (aproximação do Prometheus)."""
+    alvo, acumulado = q * n, 0
+    for i, qtd in enumerate(baldes):
+        acumulado += qtd
+        if acumulado >= alvo:
+            return BUCKETS[i] if i < len(BUCKETS) else float('inf')
+    return float('inf')
+
+
+def texto_prometheus():
+    """Todas as métricas no formato texto de exposição do Prometheus."""
+    with _lock:
+        contadores = dict(_contadores)
+        hist = {k: (list(h.baldes), h.soma, h.n) for k, h in _histogramas.items()}
+    linhas = []
+    for nome, valor in sorted(contadores.items()):
+        linhas += [f"# TYPE {PREFIXO}{nome}_total counter", f"{PREFIXO}{nome}_total {valor}"]
+    for nome, (baldes, soma, n) in sorted(hist.items()):
+        m = f"{PREFIXO}{nome}_seconds"
+        linhas.append(f"# TYPE {m} histogram")
+        acumulado = 0
+        for limite, qtd in zip((*BUCKETS, '+Inf'), baldes):
+            acumulado += qtd
+            linhas.append(f'{m}_bucket{{le="{limite}"}} {acumulado}')
+        linhas += [f"{m}_sum {soma:.6f}", f"{m}_count {n}"]
+    return "\n".join(linhas) + "\n"
+
+
+def resumo():
+    """Uma linha com o que aconteceu desde o resumo anterior (contagens, taxa, média, p50/p99)."""
+    agora = time.monotonic()
+    with _lock:
+        contadores = dict(_contadores)
+        hist = {k: (list(h.baldes), h.soma, h.n) for k, h in _histogramas.items()}
+        anterior, _janela['t'] = _janela['t'], agora
+        c_ant, _janela['contadores'] = _janela['contadores'], contadores
+        h_ant, _janela['histogramas'] = _janela['histogramas'], hist
+    dt = max(agora - anterior, 1e-9)
+    partes = []
+    for nome, valor in sorted(contadores.items()):
+        delta = valor - c_ant.get(nome, 0)
+        partes.append(f"{nome} {delta} ({delta / dt:.1f}/s)")
+    for nome, (baldes, soma, n) in sorted(hist.items()):
+        b_ant, s_ant, n_ant = h_ant.get(nome, ([0] * len(baldes), 0.0, 0))
+        dn = n - n_ant
+        if not dn:
+            continue
+        db = [a - b for a, b in zip(baldes, b_ant)]
+        partes.append(f"{nome} n={dn} média {(soma - s_ant) / dn * 1000:.2f}ms "
+                      f"p50≤{_quantil(db, dn, 0.5) * 1000:g}ms p99≤{_quantil(db, dn, 0.99) * 1000:g}ms")
+    return f"janela {dt:.0f}s: " + ("; ".join(partes) if partes else "sem atividade")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        corpo = texto_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+def inicia_servidor(porta):
+    """Sobe o endpoint /metrics em 127.0.0.1:porta numa thread daemon. Retorna o servidor ou None."""
+    try:
+        servidor = ThreadingHTTPServer(('127.0.0.1', porta), _Handler)
+    except OSError as e:
+        log.warning("Endpoint de métricas não iniciado na porta %s: %s", porta, e)
+        return None
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, name='farmtech-metricas', daemon=True).start()
+    log.info("Métricas em http://127.0.0.1:%d/metrics", servidor.server_address[1])
+    return servidor
+
+
+def _resumo_periodico(intervalo_s, logger):
+    while True:
+        time.sleep(intervalo_s)
+        logger.info("Métricas – %s", resumo())
+
+
+class ProfilerAmostragem:
+    """Amostra as stacks de todas as threads (sys._current_frames) e acumula em formato folded."""
+
+    def __init__(self, nome, hz=100, intervalo_s=60, diretorio=PROFILE_DIR):
+        self.nome = nome
+        self.periodo = 1.0 / hz
+        self.intervalo_s = intervalo_s
+        self.caminho = os.path.join(diretorio, f"{nome}-{os.getpid()}.folded")
+        self.stacks = collections.Counter()
+        self._lock = threading.Lock()
+
+    def _amostra(self):
+        proprio = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == proprio:
+                continue
+            pilha = []
+            while frame is not None:
+                codigo = frame.f_code
+                pilha.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}")
+                frame = frame.f_back
+            with self._lock:
+                self.stacks[";".join(reversed(pilha))] += 1
+
+    def grava(self):
+        """Grava o acumulado (sobrescreve o arquivo; as contagens crescem durante o processo)."""
+        with self._lock:
+            linhas = [f"{pilha} {n}\n" for pilha, n in self.stacks.most_common()]
+        os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+        tmp = self.caminho + '.tmp'
+        with open(tmp, 'w') as f:
+            f.writelines(linhas)
+        os.replace(tmp, self.caminho)
+        log.info("Profile gravado em %s (%d stacks)", self.caminho, len(linhas))
+
+    def _roda(self):
+        proximo_dump = time.monotonic() + self.intervalo_s
+        while True:
+            time.sleep(self.periodo)
+            self._amostra()
+            if time.monotonic() >= proximo_dump:
+                self.grava()
+                proximo_dump += self.intervalo_s
+
+    def inicia(self):
+        threading.Thread(target=self._roda, name='farmtech-profiler', daemon=True).start()
+        if threading.current_thread() is threading.main_thread() and hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.grava())
+        log.info("Profiler por amostragem ligado: %s", self.caminho)
+        return self
+
+
+def inicia(nome, porta=None, resumo_s=None, logger=None):
+    """
+    Liga a instrumentação do processo `nome`. Idempotente (o Streamlit reexecuta o script):
+    retorna True só na primeira chamada.
+    - porta: endpoint /metrics (default: FARMTECH_METRICS_PORT; sem porta, não sobe)
+    - resumo_s: intervalo do resumo no log
+    - profiler conforme FARMTECH_PROFILE*
+    """
+    with _lock:
+        if nome in _iniciado:
+            return False
+        _iniciado.add(nome)
+    porta = porta if porta is not None else os.environ.get(ENV_PORTA)
+    if porta:
+        inicia_servidor(int(porta))
+    if resumo_s:
+        threading.Thread(target=_resumo_periodico, args=(resumo_s, logger or log),
+                         name='farmtech-resumo', daemon=True).start()
+    if os.environ.get(ENV_PROFILE, '') not in ('', '0'):
+        ProfilerAmostragem(nome, hz=float(os.environ.get(ENV_PROFILE_HZ, 100)),
+                           intervalo_s=float(os.environ.get(ENV_PROFILE_S, 60)),
+                           diretorio=os.environ.get(ENV_PROFILE_DIR, PROFILE_DIR)).inicia()
+    return True
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ml_compilado.py
+Author: Mário (DevOps/SRE)
+Version: 1.0
+Date: 2026-10-19
+
+Avaliador "compilado" do modelo de irrigação (HistGradientBoostingClassifier).
+- train_model.py exporta as árvores treinadas para arrays NumPy planos (.npz)
+- A avaliação usa apenas NumPy: não importa scikit-learn nem joblib
+- predict_one(): uma linha em microssegundos (loop Python sobre listas)
+- predict(): lotes com NumPy, nó a nó: as linhas de cada nó são divididas entre os filhos,
+  então cada linha só desce até a própria folha; lotes pequenos usam o laço de predict_one
+
+Os limiares exportados (num_threshold) são exatamente as bordas de bin usadas
+pelo sklearn, então não é preciso discretizar as features na inferência.
+
+Licença: MIT
+"""
+
+import os
+import numpy as np
+
+FORMATO_VERSAO = 1
+LINHAS_POR_BLOCO = 65536
+LINHAS_POR_LINHA = 128  # até aqui o laço de predict_one é mais rápido que a partição por nó
+
+
+def exporta_modelo(estimator, caminho):
+    """
+    Exporta um HistGradientBoostingClassifier binário já treinado para um .npz.
+    Todas as árvores são concatenadas em um único vetor de nós; folhas apontam
+    para si mesmas, o que permite percorrer as árvores sem testar is_leaf.
+    """
+    if estimator.n_trees_per_iteration_ != 1:
+        raise ValueError("Somente classificação binária é suportada pelo modelo compilado.")
+    feature, threshold, missing_left, left, right, value, is_leaf, raizes, profundidade = \
+        [], [], [], [], [], [], [], [], []
+    offset = 0
+    for iteracao in estimator._predictors:
+        nodes = iteracao[0].nodes
+        if nodes['is_categorical'].any():
+            raise ValueError("Features categóricas não são suportadas pelo modelo compilado.")
+        n = len(nodes)
+        folha = nodes['is_leaf'].astype(bool)
+        idx = np.arange(offset, offset + n, dtype=np.int32)
+        esq = np.where(folha, idx, nodes['left'].astype(np.int32) + offset)
+        dir_ = np.where(folha, idx, nodes['right'].astype(np.int32) + offset)
+        feature.append(np.where(folha, 0, nodes['feature_idx']).astype(np.int32))
+        threshold.append(nodes['num_threshold'].astype(np.float64))
+        missing_left.append(nodes['missing_go_to_left'].astype(bool))
+        left.append(esq)
+        right.append(dir_)
+        value.append(nodes['value'].astype(np.float64))
+        is_leaf.append(folha)
+        raizes.append(offset)
+        profundidade.append(int(nodes['depth'].max()))
+        offset += n
+
+    nomes = getattr(estimator, 'feature_names_in_', None)
+    if nomes is None:
+        nomes = [f"x{i}" for i in range(estimator.n_features_in_)]
+    os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+    # np.savez acrescenta ".npz" se faltar; grava em temporário e troca atomicamente
+    tmp = caminho + '.tmp.npz'
+    np.savez(
+        tmp,
+        formato=np.int32(FORMATO_VERSAO),
+        feature=np.concatenate(feature),
+        threshold=np.concatenate(threshold),
+        missing_left=np.concatenate(missing_left),
+        left=np.concatenate(left),
+        right=np.concatenate(right),
+        value=np.concatenate(value),
+        is_leaf=np.concatenate(is_leaf),
+        raizes=np.asarray(raizes, dtype=np.int32),
+        profundidade=np.asarray(profundidade, dtype=np.int32),
+        baseline=np.float64(np.ravel(estimator._baseline_prediction)[0]),
+        classes=np.asarray(estimator.classes_),
+        feature_names=np.asarray(nomes, dtype=str),
+    )
+    os.replace(tmp, caminho)
+    return caminho
+
+
+class ModeloCompilado:
+    """Avaliador NumPy das árvores exportadas por exporta_modelo()."""
+
+    def __init__(self, arrays):
+        if int(arrays['formato']) != FORMATO_VERSAO:
+            raise ValueError(f"Formato de modelo compilado não suportado: {int(arrays['formato'])}")
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.missing_left = arrays['missing_left']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.value = arrays['value']
+        self.is_leaf = arrays['is_leaf']
+        self.raizes = arrays['raizes']
+        self.profundidade = arrays['profundidade']
+        self.baseline = float(arrays['baseline'])
+        self.classes_ = arrays['classes']
+        self.feature_names = [str(n) for n in arrays['feature_names']]
+        # Cópias em listas Python: indexação escalar bem mais rápida que em ndarray
+        self._l_feature = self.feature.tolist()
+        self._l_threshold = self.threshold.tolist()
+        self._l_missing_left = self.missing_left.tolist()
+        self._l_left = self.left.tolist()
+        self._l_right = self.right.tolist()
+        self._l_value = self.value.tolist()
+        self._l_is_leaf = self.is_leaf.tolist()
+        self._l_raizes = self.raizes.tolist()
+        self._l_classes = self.classes_.tolist()
+
+    @classmethod
+    def carrega(cls, caminho):
+        with np.load(caminho, allow_pickle=False) as npz:
+            return cls({k: npz[k] for k in npz.files})
+
+    def decision_function(self, X):
+        """Soma bruta (log-odds) para cada linha de X, na mesma ordem de soma do sklearn."""
+        X = np.asarray(X, dtype=np.float64)
+        n_features = len(self.feature_names)
+        if X.ndim != 2 or X.shape[1] != n_features:
+            raise ValueError(f"Esperado X com {n_features} colunas: {self.feature_names}")
+        if X.shape[0] <= LINHAS_POR_LINHA:
+            return np.array([self._soma_linha(linha) for linha in X.tolist()], dtype=np.float64)
+        saida = np.empty(X.shape[0], dtype=np.float64)
+        for inicio in range(0, X.shape[0], LINHAS_POR_BLOCO):
+            bloco = X[inicio:inicio + LINHAS_POR_BLOCO]
+            saida[inicio:inicio + bloco.shape[0]] = self._soma_bloco(bloco)
+        return saida
+
+    def _soma_bloco(self, bloco):
+        feature, threshold, missing_left = self._l_feature, self._l_threshold, self._l_missing_left
+        left, right, is_leaf, value = self._l_left, self._l_right, self._l_is_leaf, self._l_value
+        colunas = [np.ascontiguousarray(bloco[:, j]) for j in range(bloco.shape[1])]
+        tem_nan = bool(np.isnan(bloco).any())
+        todas = np.arange(bloco.shape[0], dtype=np.intp)
+        raw = np.full(bloco.shape[0], self.baseline)
+        # Árvore a árvore (ordem de soma do sklearn); em cada nó, só as linhas que chegaram nele
+        for raiz in self._l_raizes:
+            pilha = [(raiz, todas)]
+            while pilha:
+                no, linhas = pilha.pop()
+                if is_leaf[no]:
+                    raw[linhas] += value[no]
+                    continue
+                x = colunas[feature[no]] if linhas is todas else colunas[feature[no]].take(linhas)
+                vai_esquerda = x <= threshold[no]
+                if tem_nan and missing_left[no]:
+                    vai_esquerda |= np.isnan(x)
+                esquerda = linhas[vai_esquerda]
+                if len(esquerda) == len(linhas):
+                    pilha.append((left[no], linhas))
+                    continue
+                if len(esquerda):
+                    pilha.append((left[no], esquerda))
+                pilha.append((right[no], linhas[~vai_esquerda]))
+        return raw
+
+    def predict(self, X):
+        return self.classes_[(self.decision_function(X) > 0).astype(np.intp)]
+
+    def predict_one(self, linha):
+        """Prediz uma única linha (sequência de floats na ordem de feature_names)."""
+        return self._l_classes[1 if self._soma_linha(linha) > 0 else 0]
+
+    def _soma_linha(self, linha):
+        feature, threshold, missing_left = self._l_feature, self._l_threshold, self._l_missing_left
+        left, right, is_leaf = self._l_left, self._l_right, self._l_is_leaf
+        linha = [float(v) for v in linha]
+        raw = self.baseline
+        for no in self._l_raizes:
+            while not is_leaf[no]:
+                x = linha[feature[no]]
+                if x != x:  # NaN
+                    no = left[no] if missing_left[no] else right[no]
+                elif x <= threshold[no]:
+                    no = left[no]
+                else:
+                    no = right[no]
+            raw += self._l_value[no]
+        return raw
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+recomendacoes.py
+Author: Mário (DevOps/SRE)
+Version: 1.0
+Date: 2026-10-19
+
+Job em lote que gera as recomendações de irrigação em AcaoAgricola e HistoricoAcao.
+- Pontua as medidas ainda não avaliadas em blocos vetorizados (modelo compilado, FeatureMedida)
+- Checkpoint por id_medida em CheckpointJob, gravado na mesma transação das ações:
+  o job pode ser interrompido e reexecutado sem perder nem duplicar recomendações
+- Medidas seguidas de um dispositivo com a mesma recomendação viram um único intervalo
+  (id_medida..id_medida_fim, inicio_ms..fim_ms, n_medidas); um buraco maior que --gap-min
+  na coleta fecha o intervalo
+- Cada intervalo "Irrigar" ganha uma linha pendente em HistoricoAcao (executada = 0)
+- --reinicia apaga as ações geradas, menos as que têm histórico do produtor (executadas ou
+  anotadas): essas ficam, com substituida_ms, fora do trabalho do job
+
+Uso:
+    ./recomendacoes.py                   # continua de onde parou
+    ./recomendacoes.py --reinicia        # refaz tudo (ex.: depois de promover outro modelo)
+    ./recomendacoes.py --lote 100000 --gap-min 30
+
+Licença: MIT
+"""
+
+import argparse
+import os
+import sqlite3
+import banco
+import features
+import registro_modelos
+
+DB_FILE = os.path.join(os.path.dirname(__file__), '../farm_data.db')
+JOB = 'recomendacoes'
+LOTE = 50000
+GAP_MIN = 60
+RECOMENDACOES = {0: 'Não irrigar', 1: 'Irrigar'}
+OBSERVACAO = 'Gerada automaticamente (recomendacoes.py)'
+
+DDL_CHECKPOINT = """
+    CREATE TABLE IF NOT EXISTS CheckpointJob (
+        job VARCHAR(50) PRIMARY KEY,
+        ultimo_id INTEGER NOT NULL,
+        atualizado_ms INTEGER
+    );
+"""
+
+
+def inicializa(c):
+    banco.migra_medida_solo(c)
+    banco.migra_acoes(c)
+    features.inicializa_features(c)
+    c.execute(DDL_CHECKPOINT)
+
+
+def checkpoint(c):
+    linha = c.execute("SELECT ultimo_id FROM CheckpointJob WHERE job = ?", (JOB,)).fetchone()
+    return linha[0] if linha else 0
+
+
+def _abertas(c):
+    """Última ação de cada dispositivo: pode continuar no próximo bloco."""
+    return {linha[0]: list(linha[1:]) for linha in c.execute("""
+        SELECT a.id_dispositivo, a.id_acao, a.recomendacao, a.fim_ms
+        FROM AcaoAgricola a
+        JOIN (SELECT id_dispositivo, MAX(id_medida) AS id_medida FROM AcaoAgricola
+              WHERE versao_modelo IS NOT NULL AND substituida_ms IS NULL GROUP BY id_dispositivo) u
+          ON u.id_medida = a.id_medida
+        WHERE a.substituida_ms IS NULL
+    """)}
+
+
+def _segmentos(tempos, recs, gap_ms):
+    """Índices (inicio, fim) das sequências com a mesma recomendação e sem buraco maior que gap_ms."""
+    import numpy as np
+    quebra = np.flatnonzero((recs[1:] != recs[:-1]) | (np.abs(np.diff(tempos)) > gap_ms)) + 1
+    return np.r_[0, quebra], np.r_[quebra, len(recs)] - 1
+
+
+def _grava_bloco(c, abertas, ids, dispositivos, tempos, recs, versao, gap_ms):
+    """Funde o bloco (ordenado por id_medida) nos intervalos abertos e grava as ações novas."""
+    import numpy as np
+    novas = alteradas = 0
+    for disp in np.unique(dispositivos):
+        sel = np.flatnonzero(dispositivos == disp)
+        d_ids, d_tempos, d_recs = ids[sel], tempos[sel], recs[sel]
+        inicios, fins = _segmentos(d_tempos, d_recs, gap_ms)
+        disp = int(disp)
+        for k, (i, f) in enumerate(zip(inicios, fins)):
+            rec = RECOMENDACOES[int(d_recs[i])]
+            n = int(f - i + 1)
+            aberta = abertas.get(disp)
+            if k == 0 and aberta is not None and aberta[1] == rec and abs(d_tempos[i] - aberta[2]) <= gap_ms:
+                c.execute("""UPDATE AcaoAgricola SET id_medida_fim = ?, fim_ms = ?, n_medidas = n_medidas + ?
+                             WHERE id_acao = ?""", (int(d_ids[f]), int(d_tempos[f]), n, aberta[0]))
+                aberta[2] = int(d_tempos[f])
+                alteradas += 1
+                continue
+            c.execute("""
+                INSERT OR IGNORE INTO AcaoAgricola (id_medida, recomendacao, id_dispositivo, id_medida_fim,
+                                                    inicio_ms, fim_ms, n_medidas, versao_modelo)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (int(d_ids[i]), rec, disp, int(d_ids[f]), int(d_tempos[i]), int(d_tempos[f]), n, versao))
+            id_acao = c.lastrowid if c.rowcount else \
+                c.execute("SELECT id_acao FROM AcaoAgricola WHERE id_medida = ? AND substituida_ms IS NULL",
+                          (int(d_ids[i]),)).fetchone()[0]
+            abertas[disp] = [id_acao, rec, int(d_tempos[f])]
+            novas += 1
+    return novas, alteradas
+
+
+def executa(conn, lote=LOTE, gap_min=GAP_MIN, reinicia=False):
+    """Pontua as medidas após o checkpoint. Retorna (medidas, ações novas, ações estendidas)."""
+    import numpy as np
+    c = conn.cursor()
+    inicializa(c)
+    conn.commit()
+    if reinicia:
+        vigentes = "SELECT id_acao FROM AcaoAgricola WHERE versao_modelo IS NOT NULL AND substituida_ms IS NULL"
+        c.execute(f"""DELETE FROM HistoricoAcao WHERE executada = 0 AND observacao_produtor = ?
+                      AND id_acao IN ({vigentes})""", (OBSERVACAO,))
+        # O que sobrou no histórico é do produtor: a ação fica, marcada como substituída
+        c.execute(f"""DELETE FROM AcaoAgricola WHERE id_acao IN ({vigentes})
+                      AND id_acao NOT IN (SELECT id_acao FROM HistoricoAcao WHERE id_acao IS NOT NULL)""")
+        c.execute(f"UPDATE AcaoAgricola SET substituida_ms = ? WHERE id_acao IN ({vigentes})", (banco.agora_ms(),))
+        c.execute("DELETE FROM CheckpointJob WHERE job = ?", (JOB,))
+        conn.commit()
+    features.backfill(conn, completo=True)
+    versao = registro_modelos.resolve_versao() or 'legado'
+    model = registro_modelos.carrega_modelo()
+    gap_ms = gap_min * 60 * 1000
+    abertas = _abertas(c)
+    ultimo = checkpoint(c)
+    total = novas = alteradas = 0
+    while True:
+        linhas = c.execute(f"""
+            SELECT m.id_medida, COALESCE(m.id_dispositivo, 0), COALESCE(m.data_hora_ms, 0), {features.SELECT_FEATURES}
+            FROM MedidaSolo m
+            JOIN FeatureMedida f ON f.id_medida = m.id_medida
+            WHERE m.id_medida > ?
+            ORDER BY m.id_medida
+            LIMIT ?
+        """, (ultimo, lote)).fetchall()
+        if not linhas:
+            break
+        bloco = np.asarray(linhas, dtype=np.float64)
+        ids = bloco[:, 0].astype(np.int64)
+        recs = np.asarray(model.predict(bloco[:, 3:].astype(np.float32))).astype(np.int64)
+        n, a = _grava_bloco(c, abertas, ids, bloco[:, 1].astype(np.int64), bloco[:, 2].astype(np.int64),
+                            recs, versao, gap_ms)
+        ultimo = int(ids[-1])
+        c.execute("INSERT OR REPLACE INTO CheckpointJob (job, ultimo_id, atualizado_ms) VALUES (?, ?, ?)",
+                  (JOB, ultimo, banco.agora_ms()))
+        c.execute("""
+            INSERT INTO HistoricoAcao (id_acao, executada, data_execucao, observacao_produtor)
+            SELECT a.id_acao, 0, NULL, ? FROM AcaoAgricola a
+            WHERE a.recomendacao = ? AND a.versao_modelo IS NOT NULL AND a.substituida_ms IS NULL
+              AND NOT EXISTS (SELECT 1 FROM HistoricoAcao h WHERE h.id_acao = a.id_acao)
+        """, (OBSERVACAO, RECOMENDACOES[1]))
+        conn.commit()
+        total, novas, alteradas = total + len(ids), novas + n, alteradas + a
+    return total, novas, alteradas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera recomendações de irrigação (AcaoAgricola/HistoricoAcao) em lote.")
+    parser.add_argument('--db', type=str, default=DB_FILE, help='Caminho do banco SQLite')
+    parser.add_argument('--lote', type=int, default=LOTE, help=f'Medidas por bloco (default: {LOTE})')
+    parser.add_argument('--gap-min', type=float, default=GAP_MIN,
+                        help=f'Buraco na coleta (minutos) que fecha um intervalo (default: {GAP_MIN})')
+    parser.add_argument('--reinicia', action='store_true',
+                        help='Apaga as recomendações geradas (menos as com histórico do produtor) e refaz do início')
+    args = parser.parse_args()
+    conn = sqlite3.connect(args.db)
+    total, novas, alteradas = executa(conn, args.lote, args.gap_min, args.reinicia)
+    acoes = conn.execute("SELECT COUNT(*) FROM AcaoAgricola "
+                         "WHERE versao_modelo IS NOT NULL AND substituida_ms IS NULL").fetchone()[0]
+    conn.close()
+    print(f"{total} medidas pontuadas: {novas} ações novas, {alteradas} estendidas ({acoes} ações no total).")
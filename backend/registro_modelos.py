@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+registro_modelos.py
+Author: Mário (DevOps/SRE)
+Version: 1.0
+Date: 2026-10-19
+
+Registro versionado dos modelos de irrigação.
+- Cada treino gera uma versão em models/registry/vNNNN/ (model.pkl, model.npz, manifest.json)
+- O manifesto registra faixa de dados, hash do schema de features, score de CV,
+  tempo de fit e latência medida (linha única e lote)
+- promote/rollback trocam a versão ativa de forma atômica (os.replace no arquivo ATIVO)
+- Consumidores podem fixar uma versão com FARMTECH_MODEL_VERSION=vNNNN
+
+Uso:
+    ./registro_modelos.py list [--min-score 0.95]
+    ./registro_modelos.py show v0003
+    ./registro_modelos.py promote v0003
+    ./registro_modelos.py rollback
+    ./registro_modelos.py cheapest --min-score 0.95 [--custo lote] [--promote]
+
+Licença: MIT
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+from datetime import datetime
+
+REGISTRY_DIR = os.path.join(os.path.dirname(__file__), 'models/registry')
+LEGACY_MODEL_PATH = os.path.join(os.path.dirname(__file__), 'models/ml_irrigacao.pkl')
+ATIVO_FILE = os.path.join(REGISTRY_DIR, 'ATIVO')
+ENV_VERSAO = 'FARMTECH_MODEL_VERSION'
+MODELO = 'model.pkl'
+COMPILADO = 'model.npz'
+MANIFESTO = 'manifest.json'
+CUSTOS = {'linha': 'compilado_linha_us', 'lote': 'compilado_lote_us'}
+TOLERANCIA_LATENCIA = 1.0   # a latência é um micro-benchmark ruidoso: aceita até o dobro da ativa
+
+
+def schema_hash(features):
+    """Hash estável da lista de (nome, dtype) das features usadas no treino."""
+    texto = json.dumps([[str(n), str(t)] for n, t in features])
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()[:16]
+
+
+def _grava_json_atomico(caminho, dados):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(caminho), prefix='.tmp-')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(dados, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, caminho)
+
+
+def versoes():
+    """Lista as versões registradas em ordem crescente."""
+    if not os.path.isdir(REGISTRY_DIR):
+        return []
+    return sorted(d for d in os.listdir(REGISTRY_DIR) if re.fullmatch(r'v\d{4,}', d))
+
+
+def manifesto(versao):
+    with open(os.path.join(REGISTRY_DIR, versao, MANIFESTO)) as f:
+        return json.load(f)
+
+
+def _estado():
+    if not os.path.exists(ATIVO_FILE):
+        return {'ativo': None, 'anteriores': []}
+    with open(ATIVO_FILE) as f:
+        return json.load(f)
+
+
+def versao_ativa():
+    return _estado()['ativo']
+
+
+def resolve_versao(versao=None):
+    """Versão explícita > FARMTECH_MODEL_VERSION > ATIVO. None se o registro estiver vazio."""
+    versao = versao or os.environ.get(ENV_VERSAO) or versao_ativa()
+    if versao is not None and versao not in versoes():
+        raise ValueError(f"Versão de modelo inexistente no registro: {versao}")
+    return versao
+
+
+def caminho_modelo(versao=None):
+    """Caminho do pickle sklearn da versão resolvida (ou o modelo legado)."""
+    versao = resolve_versao(versao)
+    if versao is None:
+        return LEGACY_MODEL_PATH
+    return os.path.join(REGISTRY_DIR, versao, MODELO)
+
+
+def caminho_compilado(versao=None):
+    """Caminho do modelo compilado (.npz) da versão resolvida (None para o modelo legado, só pickle)."""
+    versao = resolve_versao(versao)
+    if versao is None:
+        return None
+    return os.path.join(REGISTRY_DIR, versao, COMPILADO)
+
+
+def carrega_modelo(versao=None):
+    """
+    Modelo da versão resolvida pronto para predict. Prefere o compilado (.npz, só NumPy);
+    sem ele cai no pickle do scikit-learn via joblib. Imports feitos aqui, sob demanda.
+    """
+    caminho = caminho_compilado(versao)
+    if caminho is not None and os.path.exists(caminho):
+        from ml_compilado import ModeloCompilado
+        return ModeloCompilado.carrega(caminho)
+    import joblib
+    return joblib.load(caminho_modelo(versao))
+
+
+def registra(estimator, dados_manifesto, exporta_compilado=None):
+    """
+    Grava uma nova versão: monta tudo em um diretório temporário e só então
+    renomeia para vNNNN, para que nenhum consumidor veja uma versão incompleta.
+    exporta_compilado(estimator, caminho) é opcional (ml_compilado.exporta_modelo).
+    """
+    import joblib
+
+    os.makedirs(REGISTRY_DIR, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=REGISTRY_DIR, prefix='.tmp-')
+    os.chmod(tmp, 0o755)
+    try:
+        joblib.dump(estimator, os.path.join(tmp, MODELO))
+        arquivos = {'modelo': MODELO}
+        if exporta_compilado is not None:
+            exporta_compilado(estimator, os.path.join(tmp, COMPILADO))
+            arquivos['compilado'] = COMPILADO
+        while True:
+            existentes = versoes()
+            numero = int(existentes[-1][1:]) + 1 if existentes else 1
+            versao = f"v{numero:04d}"
+            dados = dict(dados_manifesto, versao=versao,
+                         criado_em=datetime.now().isoformat(timespec='seconds'), arquivos=arquivos)
+            _grava_json_atomico(os.path.join(tmp, MANIFESTO), dados)
+            try:
+                os.rename(tmp, os.path.join(REGISTRY_DIR, versao))
+                return versao
+            except OSError:
+                # Outro treino registrou o mesmo número ao mesmo tempo
+                if not os.path.exists(os.path.join(REGISTRY_DIR, versao)):
+                    raise
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def promove(versao):
+    if versao not in versoes():
+        raise ValueError(f"Versão de modelo inexistente no registro: {versao}")
+    estado = _estado()
+    if estado['ativo'] == versao:
+        return versao
+    if estado['ativo'] is not None:
+        estado['anteriores'].append(estado['ativo'])
+    estado['ativo'] = versao
+    _grava_json_atomico(ATIVO_FILE, estado)
+    return versao
+
+
+def rollback():
+    """Volta para a versão ativa antes da última promoção."""
+    estado = _estado()
+    if not estado['anteriores']:
+        raise ValueError("Nenhuma versão anterior para rollback.")
+    estado['ativo'] = estado['anteriores'].pop()
+    _grava_json_atomico(ATIVO_FILE, estado)
+    return estado['ativo']
+
+
+def mais_barato(min_score, custo='linha'):
+    """Versão de menor latência (linha ou lote) cujo score de CV atinge min_score."""
+    candidatos = []
+    for v in versoes():
+        m = manifesto(v)
+        lat = m.get('latencia', {}).get(CUSTOS[custo])
+        if m.get('cv_score') is not None and m['cv_score'] >= min_score and lat is not None:
+            candidatos.append((lat, v))
+    return min(candidatos)[1] if candidatos else None
+
+
+def avalia_promocao(versao, min_score, custo='linha', tolerancia=TOLERANCIA_LATENCIA):
+    """
+    (promove, motivo) para a versão recém-treinada, comparada só com a versão ativa:
+    promove se o cv_score atinge min_score e a latência não passa de ativa * (1 + tolerancia).
+    """
+    m = manifesto(versao)
+    score = m.get('cv_score')
+    if score is None:
+        return False, "manifesto sem cv_score"
+    if score < min_score:
+        return False, f"cv_score {score:.4f} abaixo de {min_score}"
+    ativa = versao_ativa()
+    if ativa is None or ativa == versao:
+        return True, "nenhuma versão ativa"
+    lat = m.get('latencia', {}).get(CUSTOS[custo])
+    lat_ativa = manifesto(ativa).get('latencia', {}).get(CUSTOS[custo])
+    if lat is None or lat_ativa is None:
+        return True, f"sem latência de {custo} para comparar com {ativa}"
+    limite = lat_ativa * (1 + tolerancia)
+    if lat > limite:
+        return False, f"latência {lat:.1f} µs acima de {limite:.1f} µs ({ativa}: {lat_ativa:.1f} µs + {tolerancia:.0%})"
+    return True, f"cv_score {score:.4f} >= {min_score}, latência {lat:.1f} µs (limite {limite:.1f} µs)"
+
+
+def _lista(min_score=None, custo='linha'):
+    ativo = versao_ativa()
+    barato = mais_barato(min_score, custo) if min_score is not None else None
+    print(f"{'':2}{'versão':<8}{'criado em':<21}{'linhas':>9}{'cv_score':>10}{'fit(s)':>8}"
+          f"{'µs/linha':>10}{'µs/lote':>9}  schema")
+    for v in versoes():
+        m = manifesto(v)
+        lat = m.get('latencia', {})
+        marca = ('*' if v == ativo else ' ') + ('$' if v == barato else ' ')
+        print(f"{marca}{v:<8}{m.get('criado_em', ''):<21}{m.get('dados', {}).get('linhas', 0):>9}"
+              f"{m.get('cv_score', float('nan')):>10.4f}{m.get('tempo_fit_s', float('nan')):>8.2f}"
+              f"{lat.get('compilado_linha_us', float('nan')):>10.1f}{lat.get('compilado_lote_us', float('nan')):>9.2f}"
+              f"  {m.get('schema_hash', '')}")
+    print("(* = ativa" + (f", $ = mais barata com cv_score >= {min_score}" if min_score is not None else "") + ")")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Registro versionado dos modelos de irrigação FarmTech.")
+    sub = parser.add_subparsers(dest='comando', required=True)
+    p_list = sub.add_parser('list', help='Lista as versões registradas')
+    p_list.add_argument('--min-score', type=float, help='Marca a versão mais barata que atinge este score')
+    p_list.add_argument('--custo', choices=sorted(CUSTOS), default='linha')
+    p_show = sub.add_parser('show', help='Mostra o manifesto de uma versão')
+    p_show.add_argument('versao')
+    p_promote = sub.add_parser('promote', help='Torna uma versão a ativa')
+    p_promote.add_argument('versao')
+    sub.add_parser('rollback', help='Volta para a versão ativa anterior')
+    p_cheap = sub.add_parser('cheapest', help='Versão de menor latência que atinge o score mínimo')
+    p_cheap.add_argument('--min-score', type=float, required=True)
+    p_cheap.add_argument('--custo', choices=sorted(CUSTOS), default='linha')
+    p_cheap.add_argument('--promote', action='store_true', help='Promove a versão encontrada')
+    args = parser.parse_args()
+
+    try:
+        if args.comando == 'list':
+            _lista(args.min_score, args.custo)
+        elif args.comando == 'show':
+            print(json.dumps(manifesto(args.versao), indent=2, ensure_ascii=False))
+        elif args.comando == 'promote':
+            print(f"Versão ativa: {promove(args.versao)}")
+        elif args.comando == 'rollback':
+            print(f"Versão ativa: {rollback()}")
+        elif args.comando == 'cheapest':
+            versao = mais_barato(args.min_score, args.custo)
+            if versao is None:
+                raise SystemExit(f"Nenhuma versão com cv_score >= {args.min_score}.")
+            print(versao)
+            if args.promote:
+                print(f"Versão ativa: {promove(versao)}")
+    except (ValueError, FileNotFoundError) as e:
+        raise SystemExit(f"Erro: {e}")
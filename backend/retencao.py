@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+retencao.py
+Author: Mário (DevOps/SRE)
+Version: 1.0
+Date: 2026-10-19
+
+Job de retenção: move medidas antigas de MedidaSolo (e suas features) para
+partições mensais em archive/medidas_AAAAMM.db, mantendo o banco principal pequeno.
+As linhas que referenciam essas medidas (AcaoAgricola e seu HistoricoAcao, AlertaMedida)
+vão para a mesma partição, sem deixar referências penduradas no banco principal.
+Cada mês é copiado e removido em uma única transação (ATTACH), então o job pode
+ser interrompido e reexecutado sem perder ou duplicar linhas.
+
+Uso:
+    ./retencao.py --dias 365
+    ./retencao.py --dias 30 --db outro.db --archive-dir /mnt/arquivo
+
+Licença: MIT
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+from datetime import datetime
+import banco
+import estatisticas
+import features
+
+DB_FILE = os.path.join(os.path.dirname(__file__), '../farm_data.db')
+ARCHIVE_DIR = os.path.join(os.path.dirname(DB_FILE), 'archive')
+
+_MEDIDAS_DO_MES = "SELECT id_medida FROM main.MedidaSolo WHERE data_hora_ms >= ? AND data_hora_ms < ?"
+# Tabelas que referenciam MedidaSolo (direta ou indiretamente), na ordem de cópia;
+# a remoção é feita na ordem inversa
+DEPENDENTES = {
+    'AcaoAgricola': f"id_medida IN ({_MEDIDAS_DO_MES})",
+    'HistoricoAcao': f"id_acao IN (SELECT id_acao FROM main.AcaoAgricola WHERE id_medida IN ({_MEDIDAS_DO_MES}))",
+    'AlertaMedida': f"id_medida IN ({_MEDIDAS_DO_MES})",
+}
+
+
+def _ddl_na_particao(c, tabela):
+    """DDL atual de uma tabela do banco principal (com as colunas migradas) criando-a na partição anexada."""
+    sql = c.execute("SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?", (tabela,)).fetchone()[0]
+    return re.sub(r'^CREATE TABLE\s+(IF NOT EXISTS\s+)?["`]?\w+["`]?', f"CREATE TABLE IF NOT EXISTS arq.{tabela}", sql)
+
+
+def caminho_particao(archive_dir, mes):
+    return os.path.join(archive_dir, f"medidas_{mes}.db")
+
+
+def particoes(archive_dir=ARCHIVE_DIR):
+    """Partições existentes, em ordem cronológica."""
+    if not os.path.isdir(archive_dir):
+        return []
+    return sorted(os.path.join(archive_dir, f) for f in os.listdir(archive_dir)
+                  if f.startswith("medidas_") and f.endswith(".db"))
+
+
+def _limites_mes(mes):
+    """Início e fim (epoch ms, hora local) de um mês AAAAMM."""
+    ano, m = int(mes[:4]), int(mes[4:])
+    inicio = datetime(ano, m, 1)
+    fim = datetime(ano + (m == 12), m % 12 + 1, 1)
+    return banco.datetime_para_ms(inicio), banco.datetime_para_ms(fim)
+
+
+def arquiva(db_file=DB_FILE, dias=365, archive_dir=ARCHIVE_DIR):
+    """Arquiva as medidas com mais de `dias` dias. Retorna {mes: linhas_movidas}."""
+    corte = banco.agora_ms() - dias * 86400 * 1000
+    conn = sqlite3.connect(db_file)
+    c = conn.cursor()
+    banco.migra_medida_solo(c)
+    banco.migra_acoes(c)
+    features.inicializa_features(c)
+    estatisticas.inicializa_estatisticas(c)
+    conn.commit()
+    meses = [linha[0] for linha in c.execute(f"""
+        SELECT DISTINCT strftime('%Y%m', {banco.SQL_LOCALTIME})
+        FROM MedidaSolo m WHERE m.data_hora_ms < ? ORDER BY 1
+    """, (corte,))]
+    movidas = {}
+    os.makedirs(archive_dir, exist_ok=True)
+    for mes in meses:
+        inicio, fim = _limites_mes(mes)
+        fim = min(fim, corte)
+        c.execute("ATTACH DATABASE ? AS arq", (caminho_particao(archive_dir, mes),))
+        try:
+            c.execute(banco.ddl_medida_solo("arq.MedidaSolo"))
+            features.inicializa_features(c, "arq.FeatureMedida")
+            for tabela in DEPENDENTES:
+                c.execute(_ddl_na_particao(c, tabela))
+                # Partições criadas antes de uma migração do principal recebem as colunas novas
+                na_particao = {linha[1] for linha in c.execute(f"PRAGMA arq.table_info({tabela})")}
+                for linha in c.execute(f"PRAGMA main.table_info({tabela})").fetchall():
+                    if linha[1] not in na_particao:
+                        c.execute(f"ALTER TABLE arq.{tabela} ADD COLUMN {linha[1]} {linha[2]}")
+            c.execute("BEGIN")
+            c.execute("""INSERT OR IGNORE INTO arq.MedidaSolo
+                         SELECT * FROM main.MedidaSolo WHERE data_hora_ms >= ? AND data_hora_ms < ?""",
+                      (inicio, fim))
+            c.execute("""INSERT OR IGNORE INTO arq.FeatureMedida
+                         SELECT f.* FROM main.FeatureMedida f
+                         JOIN main.MedidaSolo m ON m.id_medida = f.id_medida
+                         WHERE m.data_hora_ms >= ? AND m.data_hora_ms < ?""", (inicio, fim))
+            # Ações (e seu histórico) e alertas das medidas do mês acompanham as medidas
+            for tabela, filtro in DEPENDENTES.items():
+                cols = ", ".join(linha[1] for linha in c.execute(f"PRAGMA main.table_info({tabela})").fetchall())
+                c.execute(f"INSERT OR IGNORE INTO arq.{tabela} ({cols}) SELECT {cols} FROM main.{tabela} WHERE {filtro}",
+                          (inicio, fim))
+            for tabela, filtro in reversed(DEPENDENTES.items()):
+                c.execute(f"DELETE FROM main.{tabela} WHERE {filtro}", (inicio, fim))
+            c.execute("""DELETE FROM main.FeatureMedida WHERE id_medida IN (
+                             SELECT id_medida FROM main.MedidaSolo WHERE data_hora_ms >= ? AND data_hora_ms < ?)""",
+                      (inicio, fim))
+            c.execute("DELETE FROM main.MedidaSolo WHERE data_hora_ms >= ? AND data_hora_ms < ?", (inicio, fim))
+            movidas[mes] = c.rowcount
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            c.execute("DETACH DATABASE arq")
+    conn.close()
+    return movidas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Arquiva medidas antigas em partições mensais.")
+    parser.add_argument('--dias', type=int, default=365, help='Mantém no banco principal os últimos N dias (default: 365)')
+    parser.add_argument('--db', type=str, default=DB_FILE, help='Caminho do banco SQLite')
+    parser.add_argument('--archive-dir', type=str, default=ARCHIVE_DIR, help='Diretório das partições')
+    args = parser.parse_args()
+    movidas = arquiva(args.db, args.dias, args.archive_dir)
+    for mes, n in movidas.items():
+        print(f"{mes}: {n} medidas arquivadas em {caminho_particao(args.archive_dir, mes)}")
+    print(f"Retenção concluída: {sum(movidas.values())} medidas arquivadas.")
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+servico_predicao.py
+Author: Mário (DevOps/SRE)
+Version: 1.0
+Date: 2026-10-19
+
+Serviço local de predição de irrigação (HTTP em 127.0.0.1, só biblioteca padrão + NumPy).
+- Mantém o modelo ativo do registro em memória (compilado .npz, ou o pickle do sklearn)
+- Requisições simultâneas são agrupadas em micro-lotes para um único predict
+- Endpoints:
+    GET  /irrigar?dispositivo=1                  usa a última leitura do dispositivo
+    GET  /irrigar?umidade=35&ph=6.1&fosforo=1&potassio=1[&temperatura=..][&data_hora=ISO]
+    POST /irrigar                                mesmo conteúdo em JSON
+    GET  /melhor-periodo?dias=7[&dispositivo=1]  média prevista por dia/período e o melhor período
+    GET  /stats                                  p50/p99 de latência, requisições/s, tamanho médio dos lotes
+    GET  /metrics                                formato Prometheus (metricas.py)
+- SIGHUP recarrega o modelo (ex.: depois de registro_modelos.py promote)
+
+Uso:
+    ./servico_predicao.py [--porta 8765] [--espera-ms 0] [--max-lote 4096]
+    curl -s 'http://127.0.0.1:8765/irrigar?dispositivo=1'
+
+Licença: MIT
+"""
+
+import argparse
+import collections
+import json
+import logging
+import os
+import queue
+import signal
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+import farmtech_logs
+import features
+import metricas
+import registro_modelos
+
+DB_FILE = os.path.join(os.path.dirname(__file__), '../farm_data.db')
+PORTA = 8765
+MAX_LOTE = 4096
+ESPERA_MS = 0.0        # 0: agrupa só o que chegou enquanto o lote anterior era avaliado
+LIMIAR_VETORIZADO = 64  # abaixo disso o compilado é mais rápido linha a linha (predict_one)
+JANELA_STATS_S = 60
+MAX_DIAS = 90
+PERIODOS = ((0, 'Madrugada'), (6, 'Manhã'), (12, 'Tarde'), (18, 'Noite'))
+
+log = logging.getLogger('farmtech.servico')
+
+
+def periodo(hora):
+    """Período do dia (mesma divisão do dashboard Streamlit)."""
+    nome = PERIODOS[0][1]
+    for inicio, p in PERIODOS:
+        if hora >= inicio:
+            nome = p
+    return nome
+
+
+class MicroLote:
+    """
+    Fila de pedidos de predição avaliados em lote por uma única thread.
+    Cada pedido é uma lista de linhas de features; o resultado volta por um Future.
+    """
+
+    def __init__(self, modelo, versao, max_lote=MAX_LOTE, espera_s=ESPERA_MS / 1000):
+        self.modelo, self.versao = modelo, versao
+        self.max_lote = max_lote
+        self.espera_s = espera_s
+        self.fila = queue.SimpleQueue()
+        self.lotes = self.linhas = 0
+        threading.Thread(target=self._roda, name='farmtech-microlote', daemon=True).start()
+
+    def troca_modelo(self, modelo, versao):
+        self.modelo, self.versao = modelo, versao
+
+    def prediz(self, linhas, timeout=10):
+        futuro = Future()
+        self.fila.put((linhas, futuro))
+        return futuro.result(timeout=timeout)
+
+    def _avalia(self, X):
+        modelo = self.modelo
+        if len(X) < LIMIAR_VETORIZADO and hasattr(modelo, 'predict_one'):
+            return np.array([modelo.predict_one(linha) for linha in X.tolist()])
+        return np.asarray(modelo.predict(X))
+
+    def _roda(self):
+        while True:
+            pedidos = [self.fila.get()]
+            n = len(pedidos[0][0])
+            limite = time.monotonic() + self.espera_s
+            while n < self.max_lote:
+                try:
+                    resto = limite - time.monotonic()
+                    pedido = self.fila.get(timeout=resto) if resto > 0 else self.fila.get_nowait()
+                except queue.Empty:
+                    break
+                pedidos.append(pedido)
+                n += len(pedido[0])
+            try:
+                X = np.asarray([linha for linhas, _ in pedidos for linha in linhas], dtype=np.float32)
+                with metricas.cronometro('servico_predict'):
+                    y = self._avalia(X)
+            except Exception as e:
+                for _, futuro in pedidos:
+                    futuro.set_exception(e)
+                continue
+            self.lotes += 1
+            self.linhas += n
+            metricas.incrementa('servico_lotes')
+            i = 0
+            for linhas, futuro in pedidos:
+                futuro.set_result(y[i:i + len(linhas)])
+                i += len(linhas)
+
+
+class Estatisticas:
+    """Latências das últimas requisições (janela de JANELA_STATS_S) para p50/p99 e req/s."""
+
+    def __init__(self):
+        self.amostras = collections.deque()
+        self.total = 0
+        self.lock = threading.Lock()
+
+    def registra(self, segundos):
+        agora = time.monotonic()
+        metricas.observa('servico_requisicao', segundos)
+        with self.lock:
+            self.total += 1
+            self.amostras.append((agora, segundos))
+            while self.amostras and self.amostras[0][0] < agora - JANELA_STATS_S:
+                self.amostras.popleft()
+
+    def resumo(self, lote):
+        with self.lock:
+            lat = sorted(s for _, s in self.amostras)
+            janela = min(JANELA_STATS_S, time.monotonic() - self.amostras[0][0]) if self.amostras else 0
+            total = self.total
+        q = lambda p: round(lat[min(len(lat) - 1, int(p * len(lat)))] * 1000, 3) if lat else None
+        return {
+            'requisicoes': total,
+            'janela_s': round(janela, 1),
+            'req_s': round(len(lat) / janela, 2) if janela else 0.0,
+            'p50_ms': q(0.50),
+            'p99_ms': q(0.99),
+            'lotes': lote.lotes,
+            'linhas_por_lote': round(lote.linhas / lote.lotes, 2) if lote.lotes else None,
+            'versao_modelo': lote.versao,
+        }
+
+
+def ultima_leitura(db_file, dispositivo=None):
+    """Features da última medida (do dispositivo, se informado) e a data/hora dela."""
+    conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True)
+    try:
+        filtro, params = ("WHERE m.id_dispositivo = ?", (dispositivo,)) if dispositivo is not None else ("", ())
+        linha = conn.execute(f"""
+            SELECT m.id_medida, m.data_hora_ms, {features.SELECT_FEATURES}
+            FROM MedidaSolo m JOIN FeatureMedida f ON f.id_medida = m.id_medida
+            {filtro} ORDER BY m.id_medida DESC LIMIT 1
+        """, params).fetchone()
+    finally:
+        conn.close()
+    if linha is None:
+        raise LookupError("Nenhuma medida" + (f" do dispositivo {dispositivo}" if dispositivo is not None else ""))
+    return linha[0], linha[1], dict(zip(features.FEATURES, linha[2:]))
+
+
+def _num(params, nome, padrao=None):
+    valor = params.get(nome, padrao)
+    return None if valor is None or valor == '' else float(valor)
+
+
+class Servico:
+    def __init__(self, db_file, lote):
+        self.db_file = db_file
+        self.lote = lote
+        self.stats = Estatisticas()
+
+    def _entrada(self, params):
+        """Leitura pedida: valores explícitos ou a última do dispositivo."""
+        if 'umidade' in params or 'ph' in params:
+            faltando = [nome for nome in ('umidade', 'ph') if _num(params, nome) is None]
+            if faltando:
+                raise ValueError(f"faltam campos obrigatórios: {', '.join(faltando)}")
+            data_hora = datetime.fromisoformat(params['data_hora']) if params.get('data_hora') else datetime.now()
+            valores = features.calcula_features(_num(params, 'umidade'), _num(params, 'ph'),
+                                                _num(params, 'fosforo', 0), _num(params, 'potassio', 0),
+                                                _num(params, 'temperatura'), data_hora)
+            return None, dict(zip(features.FEATURES, valores))
+        dispositivo = int(params['dispositivo']) if params.get('dispositivo') else None
+        id_medida, data_hora_ms, valores = ultima_leitura(self.db_file, dispositivo)
+        # "Irrigar agora": leitura mais recente, hora atual
+        agora = datetime.now()
+        valores.update(hour=agora.hour, weekday=agora.weekday())
+        return {'id_medida': id_medida, 'data_hora_ms': data_hora_ms}, valores
+
+    def irrigar(self, params):
+        origem, valores = self._entrada(params)
+        pred = int(self.lote.prediz([[valores[f] for f in features.FEATURES]])[0])
+        return {'irrigar': bool(pred), 'predicao': pred, 'entrada': valores, 'medida': origem,
+                'versao_modelo': self.lote.versao}
+
+    def melhor_periodo(self, params):
+        dias = int(params.get('dias', 1))
+        if not 1 <= dias <= MAX_DIAS:
+            raise ValueError(f"dias deve estar entre 1 e {MAX_DIAS}")
+        origem, valores = self._entrada(params)
+        inicio = datetime.now().replace(minute=0, second=0, microsecond=0)
+        horas = [inicio + timedelta(hours=h) for h in range(dias * 24)]
+        base = [valores[f] for f in features.FEATURES]
+        i_hora, i_dia = features.FEATURES.index('hour'), features.FEATURES.index('weekday')
+        linhas = []
+        for dt in horas:
+            linha = list(base)
+            linha[i_hora], linha[i_dia] = dt.hour, dt.weekday()
+            linhas.append(linha)
+        pred = self.lote.prediz(linhas)
+        soma = collections.defaultdict(lambda: collections.defaultdict(lambda: [0, 0]))
+        for dt, p in zip(horas, pred):
+            acc = soma[dt.date().isoformat()][periodo(dt.hour)]
+            acc[0] += int(p)
+            acc[1] += 1
+        por_dia = []
+        destaque = collections.Counter()
+        for dia, periodos in soma.items():
+            medias = {nome: round(s / n, 4) for nome, (s, n) in periodos.items()}
+            melhor = max(medias, key=medias.get)
+            destaque[melhor] += 1
+            por_dia.append({'dia': dia, 'medias': medias, 'melhor_periodo': melhor})
+        return {'dias': dias, 'por_dia': por_dia, 'dias_em_destaque': dict(destaque.most_common()),
+                'entrada': valores, 'medida': origem, 'versao_modelo': self.lote.versao}
+
+
+def _handler(servico):
+    rotas = {'/irrigar': servico.irrigar, '/melhor-periodo': servico.melhor_periodo}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _responde(self, codigo, corpo, tipo='application/json; charset=utf-8'):
+            dados = corpo if isinstance(corpo, bytes) else \
+                json.dumps(corpo, ensure_ascii=False, default=float).encode('utf-8')
+            self.send_response(codigo)
+            self.send_header('Content-Type', tipo)
+            self.send_header('Content-Length', str(len(dados)))
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def _atende(self, params):
+            inicio = time.perf_counter()
+            url = urlparse(self.path)
+            params.update({k: v[-1] for k, v in parse_qs(url.query).items()})
+            try:
+                if url.path == '/stats':
+                    self._responde(200, servico.stats.resumo(servico.lote))
+                    return
+                if url.path == '/metrics':
+                    self._responde(200, metricas.texto_prometheus().encode('utf-8'),
+                                   'text/plain; version=0.0.4; charset=utf-8')
+                    return
+                rota = rotas.get(url.path)
+                if rota is None:
+                    self._responde(404, {'erro': f"rota desconhecida: {url.path}"})
+                    return
+                self._responde(200, rota(params))
+                servico.stats.registra(time.perf_counter() - inicio)
+            except (ValueError, KeyError) as e:
+                self._responde(400, {'erro': str(e)})
+            except LookupError as e:
+                self._responde(404, {'erro': str(e)})
+            except Exception as e:
+                log.exception("Erro em %s", self.path)
+                self._responde(500, {'erro': str(e)})
+
+        def do_GET(self):
+            self._atende({})
+
+        def do_POST(self):
+            tamanho = int(self.headers.get('Content-Length') or 0)
+            try:
+                corpo = json.loads(self.rfile.read(tamanho) or b'{}')
+            except json.JSONDecodeError as e:
+                self._responde(400, {'erro': f"JSON inválido: {e}"})
+                return
+            if not isinstance(corpo, dict):
+                self._responde(400, {'erro': "o corpo deve ser um objeto JSON"})
+                return
+            # Só números e textos; bool é subclasse de int e também é recusado
+            invalidos = [k for k, v in corpo.items() if isinstance(v, bool) or not isinstance(v, (int, float, str))]
+            if invalidos:
+                self._responde(400, {'erro': f"valores devem ser números ou textos: {', '.join(invalidos)}"})
+                return
+            self._atende({k: str(v) for k, v in corpo.items()})
+
+        def log_message(self, formato, *args):
+            log.debug("%s - " + formato, self.address_string(), *args)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serviço local de predição de irrigação com micro-lotes.")
+    parser.add_argument('--porta', type=int, default=PORTA, help=f'Porta em 127.0.0.1 (default: {PORTA})')
+    parser.add_argument('--db', type=str, default=DB_FILE, help='Caminho do banco SQLite')
+    parser.add_argument('--versao', type=str, default=None, help='Versão do registro (default: a ativa)')
+    parser.add_argument('--max-lote', type=int, default=MAX_LOTE, help='Máximo de linhas por predict')
+    parser.add_argument('--espera-ms', type=float, default=ESPERA_MS,
+                        help='Espera extra para juntar pedidos num lote (default: 0, só agrupa a fila)')
+    parser.add_argument('--log-level', type=str, default=None)
+    args = parser.parse_args()
+    farmtech_logs.configura(nivel=args.log_level)
+
+    versao = registro_modelos.resolve_versao(args.versao)
+    lote = MicroLote(registro_modelos.carrega_modelo(versao), versao or 'legado',
+                     max_lote=args.max_lote, espera_s=args.espera_ms / 1000)
+    servico = Servico(args.db, lote)
+
+    def recarrega(signum, frame):
+        nova = registro_modelos.resolve_versao(args.versao)
+        lote.troca_modelo(registro_modelos.carrega_modelo(nova), nova or 'legado')
+        log.info("Modelo recarregado: %s", lote.versao)
+
+    servidor = ThreadingHTTPServer(('127.0.0.1', args.porta), _handler(servico))
+    servidor.daemon_threads = True
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=servidor.shutdown).start())
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, recarrega)
+    metricas.inicia('servico_predicao', resumo_s=60, logger=log)
+    log.info("Serviço de predição em http://127.0.0.1:%d (modelo %s)", args.porta, lote.versao)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        log.info("Serviço encerrado.")
+
+
+if __name__ == "__main__":
+    main()
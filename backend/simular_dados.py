@@ -16,8 +16,17 @@ from tqdm import tqdm
 import argparse
 import os
 import sqlite3
+import features
+import banco
 
 DB_FILE = os.path.join(os.path.dirname(__file__), '../farm_data.db')
+INSERT_MEDIDA = """
+    INSERT INTO MedidaSolo (
+        data_hora_ms, valor_umidade, valor_ph, valor_npk,
+        temperatura, previsao_chuva, crescimento_percentual,
+        id_dispositivo, id_talhao, peso
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
 
 def simula_leitura(dt):
     hour = dt.hour
@@ -67,7 +76,7 @@ def simular_para_csv_e_ou_banco(dias=90, freq=1, csv_file="dados_simulados.csv",
     header = [
         "data_hora", "valor_umidade", "valor_ph", "valor_npk",
         "temperatura", "previsao_chuva", "crescimento_percentual",
-        "id_dispositivo", "id_talhao"
+        "id_dispositivo", "id_talhao", "peso"
     ]
 
     # Determina o melhor período para cada dia
@@ -88,6 +97,7 @@ def simular_para_csv_e_ou_banco(dias=90, freq=1, csv_file="dados_simulados.csv",
     if inserir_no_banco:
         conn = sqlite3.connect(db_file)
         c = conn.cursor()
+        banco.migra_medida_solo(c)
 
     with open(csv_file, "w", newline='') as f:
         writer = csv.writer(f)
@@ -107,38 +117,30 @@ def simular_para_csv_e_ou_banco(dias=90, freq=1, csv_file="dados_simulados.csv",
                 periodo_horas = range(12,18)
             else:
                 periodo_horas = range(18,24)
-            # Reforça exemplos positivos apenas no melhor período sorteado do dia
-            repetir = 3 if (
+            # Reforça exemplos positivos apenas no melhor período sorteado do dia:
+            # grava a leitura uma vez com peso 3 (usado como sample_weight no treino)
+            peso = 3 if (
                 row[1] < 40.0 and
                 row[2] > 5.5 and row[2] < 6.5 and
                 row[3] == "Fósforo:1,Potássio:1" and
                 hour in periodo_horas
             ) else 1
-            for _ in range(repetir):
-                writer.writerow(row)
-                if inserir_no_banco:
-                    batch.append(tuple(row))
-                if inserir_no_banco and len(batch) >= 5000:
-                    c.executemany("""
-                        INSERT INTO MedidaSolo (
-                            data_hora, valor_umidade, valor_ph, valor_npk,
-                            temperatura, previsao_chuva, crescimento_percentual,
-                            id_dispositivo, id_talhao
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, batch)
-                    conn.commit()
-                    batch = []
+            row.append(peso)
+            writer.writerow(row)
+            if inserir_no_banco:
+                batch.append((banco.datetime_para_ms(dt), *row[1:]))
+            if inserir_no_banco and len(batch) >= 5000:
+                c.executemany(INSERT_MEDIDA, batch)
+                conn.commit()
+                batch = []
         # Insere o restante do batch
         if inserir_no_banco and batch:
-            c.executemany("""
-                INSERT INTO MedidaSolo (
-                    data_hora, valor_umidade, valor_ph, valor_npk,
-                    temperatura, previsao_chuva, crescimento_percentual,
-                    id_dispositivo, id_talhao
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, batch)
+            c.executemany(INSERT_MEDIDA, batch)
             conn.commit()
-            conn.close()
+    if inserir_no_banco:
+        # Calcula as features das novas medidas de uma vez, em SQL
+        features.backfill(conn, completo=False)
+        conn.close()
     print(f"Arquivo gerado com sucesso: {os.path.abspath(csv_file)}")
     if inserir_no_banco:
         print(f"Dados também inseridos no banco: {db_file}")
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+telemetria_binaria.py
+Author: Mário (DevOps/SRE)
+Version: 1.0
+Date: 2026-10-19
+
+Quadro binário compacto da telemetria ESP32 -> coletor (alternativa à linha de texto).
+- 13 bytes por leitura (a linha de texto tem ~75), little-endian:
+
+    0     sync 0xA5
+    1     versão do formato (1)
+    2-3   id_dispositivo (uint16)
+    4-5   seq (uint16, volta a 0 depois de 65535)
+    6-7   umidade em centésimos de % (uint16; 0xFFFF = leitura inválida/NaN)
+    8-9   pH em centésimos (uint16; 0xFFFF = inválido)
+    10    flags: bit0 fósforo, bit1 potássio, bit2 relé
+    11-12 CRC-16/CCITT-FALSE (poli 0x1021, início 0xFFFF) dos bytes 0-10
+
+- DecodificadorQuadros decodifica em fluxo: recebe blocos de qualquer tamanho, devolve
+  todos os quadros completos do bloco e guarda o resto para a próxima leitura
+- Byte corrompido/perdido: o CRC falha e a busca recomeça no próximo sync (ressincroniza)
+- Lacunas pela sequência: cada quadro informa quantos quadros do dispositivo se perderam antes dele
+- O encoder do ESP32 fica em src/esp32-farm-tech-solutions.ino (MODO_BINARIO)
+
+Uso:
+    ./telemetria_binaria.py captura.bin     # decodifica uma captura do serial e mostra o resumo
+
+Licença: MIT
+"""
+
+import argparse
+import binascii
+import collections
+import struct
+import sys
+
+SYNC = 0xA5
+VERSAO = 1
+CORPO = struct.Struct('<BBHHHHB')
+CRC = struct.Struct('<H')
+TAMANHO = CORPO.size + CRC.size
+CRC_INICIAL = 0xFFFF
+INVALIDO = 0xFFFF
+FOSFORO, POTASSIO, RELE = 0x01, 0x02, 0x04
+
+Quadro = collections.namedtuple(
+    'Quadro', 'id_dispositivo seq umidade ph fosforo potassio rele perdidos reinicio')
+
+
+def crc16(dados):
+    """CRC-16/CCITT-FALSE (o mesmo do .ino); binascii.crc_hqx é implementado em C."""
+    return binascii.crc_hqx(dados, CRC_INICIAL)
+
+
+def _centesimos(valor):
+    if valor is None or valor != valor or not 0 <= valor < INVALIDO / 100:
+        return INVALIDO
+    return int(round(valor * 100))
+
+
+def codifica(id_dispositivo, seq, umidade, ph, fosforo, potassio, rele):
+    """Quadro de uma leitura (simuladores e testes; o ESP32 monta o mesmo quadro em C)."""
+    flags = (FOSFORO if fosforo else 0) | (POTASSIO if potassio else 0) | (RELE if rele else 0)
+    corpo = CORPO.pack(SYNC, VERSAO, id_dispositivo, seq & 0xFFFF, _centesimos(umidade), _centesimos(ph), flags)
+    return corpo + CRC.pack(crc16(corpo))
+
+
+class DecodificadorQuadros:
+    """
+    Decodificador incremental. Contadores:
+    - quadros: quadros válidos
+    - descartados: bytes ignorados na ressincronização (ruído, texto, quadros corrompidos)
+    - falhas_crc: candidatos a quadro rejeitados (versão ou CRC)
+    - perdidos: quadros que faltaram pela sequência
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.ultimo_seq = {}
+        self.quadros = self.descartados = self.falhas_crc = self.perdidos = 0
+
+    def alimenta(self, dados):
+        """Acrescenta `dados` ao buffer e devolve a lista de quadros completos decodificados."""
+        buf = self.buffer
+        buf += dados
+        quadros = []
+        i, n = 0, len(buf)
+        while True:
+            j = buf.find(SYNC, i)
+            if j < 0:
+                self.descartados += n - i
+                i = n
+                break
+            self.descartados += j - i
+            if n - j < TAMANHO:
+                i = j
+                break
+            _, versao, disp, seq, umidade, ph, flags = CORPO.unpack_from(buf, j)
+            if versao != VERSAO or crc16(bytes(buf[j:j + CORPO.size])) != CRC.unpack_from(buf, j + CORPO.size)[0]:
+                # Sync falso ou quadro corrompido: tenta a partir do próximo byte
+                self.falhas_crc += 1
+                self.descartados += 1
+                i = j + 1
+                continue
+            quadros.append(self._quadro(disp, seq, umidade, ph, flags))
+            i = j + TAMANHO
+        del buf[:i]
+        return quadros
+
+    def _quadro(self, disp, seq, umidade, ph, flags):
+        anterior = self.ultimo_seq.get(disp)
+        self.ultimo_seq[disp] = seq
+        perdidos, reinicio = 0, False
+        if anterior is not None:
+            perdidos = (seq - anterior - 1) & 0xFFFF
+            if seq == 0 and perdidos:
+                # O ESP32 começa em 0 ao ligar: reinício, não perda
+                perdidos, reinicio = 0, True
+        self.perdidos += perdidos
+        self.quadros += 1
+        return Quadro(disp, seq,
+                      None if umidade == INVALIDO else umidade / 100,
+                      None if ph == INVALIDO else ph / 100,
+                      bool(flags & FOSFORO), bool(flags & POTASSIO), bool(flags & RELE),
+                      perdidos, reinicio)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Decodifica uma captura binária da telemetria do ESP32.")
+    parser.add_argument('arquivo', nargs='?', default='-', help='Captura do serial (default: stdin)')
+    parser.add_argument('--bloco', type=int, default=4096, help='Bytes por leitura (default: 4096)')
+    parser.add_argument('--mostra', type=int, default=10, help='Quadros impressos (default: 10)')
+    args = parser.parse_args()
+    entrada = sys.stdin.buffer if args.arquivo == '-' else open(args.arquivo, 'rb')
+    dec = DecodificadorQuadros()
+    mostrados = 0
+    with entrada:
+        while bloco := entrada.read(args.bloco):
+            for q in dec.alimenta(bloco):
+                if mostrados < args.mostra or q.perdidos or q.reinicio:
+                    print(q)
+                    mostrados += 1
+    print(f"{dec.quadros} quadros, {dec.perdidos} perdidos pela sequência, "
+          f"{dec.falhas_crc} falhas de CRC, {dec.descartados} bytes descartados.")
@@ -0,0 +1,5 @@
+# Os módulos do backend se importam pelo nome (import banco, import features...), como nos scripts
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
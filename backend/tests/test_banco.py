@@ -0,0 +1,77 @@
+"""Migração de bancos antigos (data_hora em texto, sem peso) para data_hora_ms + peso."""
+
+import sqlite3
+
+import pytest
+
+import banco
+
+DDL_ANTIGA = """
+    CREATE TABLE MedidaSolo (
+        id_medida INTEGER PRIMARY KEY,
+        data_hora DATETIME,
+        valor_umidade DOUBLE,
+        valor_ph DOUBLE,
+        valor_npk VARCHAR(100),
+        temperatura DOUBLE,
+        previsao_chuva VARCHAR(20),
+        crescimento_percentual DOUBLE,
+        id_dispositivo INTEGER,
+        id_talhao INTEGER
+    )
+"""
+REFORCADA = ('2025-06-01 06:00:00', 35.0, 6.0, 'Fósforo:1,Potássio:1', None, None, None, 1, 1)
+WOKWI = ('2025-06-20 22:13:09', 39.0, 7.78, 'Fósforo:0,Potássio:0', None, None, None, 1, 1)
+
+
+@pytest.fixture
+def cursor(tmp_path):
+    conn = sqlite3.connect(tmp_path / 'antigo.db')
+    c = conn.cursor()
+    c.execute(DDL_ANTIGA)
+    c.execute(banco.DDL_ACAO_AGRICOLA)
+    yield c
+    conn.close()
+
+
+def _insere(c, *linhas):
+    c.executemany("INSERT INTO MedidaSolo (data_hora, valor_umidade, valor_ph, valor_npk, temperatura, "
+                  "previsao_chuva, crescimento_percentual, id_dispositivo, id_talhao) "
+                  "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", linhas)
+
+
+def _migra(c):
+    banco.migra_medida_solo(c)
+    c.connection.commit()
+    return c.execute("SELECT id_medida, peso FROM MedidaSolo ORDER BY id_medida").fetchall()
+
+
+def test_trio_reforcado_vira_uma_linha_com_peso_3(cursor):
+    _insere(cursor, REFORCADA, REFORCADA, REFORCADA)
+    cursor.execute("INSERT INTO AcaoAgricola (id_medida, recomendacao) VALUES (3, 'Irrigar')")
+    assert _migra(cursor) == [(1, 3.0)]
+    assert cursor.execute("SELECT id_medida FROM AcaoAgricola").fetchall() == [(1,)]
+
+
+def test_leituras_identicas_fora_da_regra_sao_mantidas(cursor):
+    # Coletor real: duas leituras no mesmo segundo com os mesmos valores
+    _insere(cursor, WOKWI, WOKWI)
+    assert _migra(cursor) == [(1, 1.0), (2, 1.0)]
+
+
+def test_copias_que_nao_formam_trio_consecutivo_sao_mantidas(cursor):
+    outra = ('2025-06-01 06:01:00',) + REFORCADA[1:]
+    _insere(cursor, REFORCADA, REFORCADA, outra, REFORCADA)
+    assert _migra(cursor) == [(1, 1.0), (2, 1.0), (3, 1.0), (4, 1.0)]
+
+
+def test_seis_copias_viram_dois_trios(cursor):
+    _insere(cursor, *[REFORCADA] * 6, WOKWI)
+    assert _migra(cursor) == [(1, 3.0), (4, 3.0), (7, 1.0)]
+
+
+def test_migracao_idempotente(cursor):
+    _insere(cursor, REFORCADA, REFORCADA, REFORCADA, WOKWI, WOKWI)
+    primeira = _migra(cursor)
+    assert _migra(cursor) == primeira
+    assert cursor.execute("SELECT SUM(peso) FROM MedidaSolo").fetchone()[0] == 5
@@ -0,0 +1,59 @@
+"""O avaliador compilado (ml_compilado.py) tem de predizer exatamente como o sklearn."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import HistGradientBoostingClassifier
+
+import features
+from ml_compilado import exporta_modelo, ModeloCompilado
+
+
+@pytest.fixture(scope='module')
+def treino():
+    """Leituras sintéticas nas faixas do simulador; o relé liga com solo seco (com ruído)."""
+    rng = np.random.default_rng(42)
+    n = 3000
+    X = pd.DataFrame({
+        'valor_umidade': rng.uniform(30, 46, n),
+        'valor_ph': rng.uniform(5, 7.8, n),
+        'fosforo': rng.integers(0, 2, n),
+        'potassio': rng.integers(0, 2, n),
+        'temperatura': rng.uniform(15, 35, n),
+        'hour': rng.integers(0, 24, n),
+        'weekday': rng.integers(0, 7, n),
+    }, columns=features.FEATURES).astype(np.float32)
+    y = ((X['valor_umidade'] < 36) ^ (rng.random(n) < 0.1)).astype(int)
+    X.loc[rng.random(n) < 0.05, 'temperatura'] = np.nan  # caminho de valores ausentes
+    clf = HistGradientBoostingClassifier(max_iter=50, random_state=0).fit(X, y)
+    return clf, X
+
+
+@pytest.fixture(scope='module')
+def compilado(treino, tmp_path_factory):
+    clf, _ = treino
+    return ModeloCompilado.carrega(exporta_modelo(clf, str(tmp_path_factory.mktemp('modelo') / 'model.npz')))
+
+
+def test_predict_igual_ao_sklearn(treino, compilado):
+    clf, X = treino
+    np.testing.assert_array_equal(compilado.predict(X.to_numpy()), clf.predict(X))
+
+
+def test_predict_one_igual_ao_sklearn(treino, compilado):
+    clf, X = treino
+    esperado = clf.predict(X)
+    obtido = np.array([compilado.predict_one(linha) for linha in X.to_numpy()])
+    np.testing.assert_array_equal(obtido, esperado)
+
+
+def test_decision_function_igual_ao_sklearn(treino, compilado):
+    clf, X = treino
+    np.testing.assert_allclose(compilado.decision_function(X.to_numpy()), clf.decision_function(X), rtol=0, atol=1e-12)
+
+
+def test_lote_pequeno_igual_ao_sklearn(treino, compilado):
+    # Até LINHAS_POR_LINHA linhas o predict usa o laço de predict_one
+    clf, X = treino
+    pequeno = X.iloc[:50]
+    np.testing.assert_array_equal(compilado.predict(pequeno.to_numpy()), clf.predict(pequeno))
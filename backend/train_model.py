@@ -15,48 +15,141 @@ Licença: MIT
 
 import sqlite3
 import pandas as pd
-import joblib
+import sklearn
 from sklearn.ensemble import HistGradientBoostingClassifier
 from sklearn.model_selection import TimeSeriesSplit, GridSearchCV
+from sklearn.metrics import accuracy_score, make_scorer
 import os
+import sys
+import time
+import argparse
+import tempfile
+from ml_compilado import exporta_modelo, ModeloCompilado
+import registro_modelos
+import features
+import banco
 
 DB_FILE = os.path.join(os.path.dirname(__file__), '../farm_data.db')
-MODEL_FILE = os.path.join(os.path.dirname(__file__), 'models/ml_irrigacao.pkl')
+CV_SPLITS = 3
+
+parser = argparse.ArgumentParser(description="Treina o modelo de irrigação e registra uma nova versão.")
+parser.add_argument('--no-promote', action='store_true', help='Registra a versão sem torná-la ativa')
+parser.add_argument('--min-score', type=float, default=None,
+                    help='Só promove se a nova versão atingir este cv_score e não for mais lenta que a ativa '
+                         'além da tolerância (registro_modelos.avalia_promocao)')
+parser.add_argument('--custo', choices=sorted(registro_modelos.CUSTOS), default='linha',
+                    help='Latência comparada com a da versão ativa com --min-score (default: linha)')
+parser.add_argument('--tolerancia', type=float, default=registro_modelos.TOLERANCIA_LATENCIA,
+                    help='Folga relativa sobre a latência da ativa '
+                         f'(default: {registro_modelos.TOLERANCIA_LATENCIA}, ou seja, até o dobro)')
+args = parser.parse_args()
 
 conn = sqlite3.connect(DB_FILE)
-df = pd.read_sql(
-    "SELECT id_medida, data_hora, valor_umidade, valor_ph, valor_npk, temperatura FROM MedidaSolo",
-    conn, parse_dates=["data_hora"])
+banco.migra_medida_solo(conn.cursor())
+# Garante features para medidas inseridas sem passar pelo coletor
+features.backfill(conn, completo=True)
+# Target do relé conforme sua lógica (sobre os valores brutos da medida)
+df = pd.read_sql(f"""
+    SELECT f.id_medida, m.data_hora_ms, m.peso, {features.SELECT_FEATURES},
+           COALESCE(f.fosforo = 1 AND f.potassio = 1 AND m.valor_umidade < 40.0
+                    AND m.valor_ph > 5.5 AND m.valor_ph < 6.5, 0) AS rele_state
+    FROM FeatureMedida f
+    JOIN MedidaSolo m ON m.id_medida = f.id_medida
+    ORDER BY f.id_medida
+""", conn)
 conn.close()
 
-# Extrair fósforo e potássio do valor_npk
-df['fosforo'] = df['valor_npk'].str.extract(r"Fósforo:(\d)").astype(float)
-df['potassio'] = df['valor_npk'].str.extract(r"Potássio:(\d)").astype(float)
-
-# Adicionar hora do dia e dia da semana
-df['hour'] = df['data_hora'].dt.hour
-df['weekday'] = df['data_hora'].dt.weekday
-
-# Target do relé conforme sua lógica
-df['rele_state'] = (
-    (df['fosforo'] == 1) &
-    (df['potassio'] == 1) &
-    (df['valor_umidade'] < 40.0) &
-    (df['valor_ph'] > 5.5) &
-    (df['valor_ph'] < 6.5)
-).astype(int)
+# Banco vazio (ex.: tudo já arquivado pela retenção) não é erro do job: sai sem registrar versão
+if len(df) <= CV_SPLITS or df['rele_state'].nunique() < 2:
+    print(f"{len(df)} medidas no banco ({df['rele_state'].nunique()} classe(s) do relé); o treino precisa de "
+          f"mais de {CV_SPLITS} (TimeSeriesSplit) e das duas classes. Nada a fazer.")
+    sys.exit(0)
 
 print("Distribuição do target (rele_state):")
 print(df['rele_state'].value_counts())
 
-# Features e target
-X = df[['valor_umidade', 'valor_ph', 'fosforo', 'potassio', 'temperatura', 'hour', 'weekday']].fillna(0)
+# Features (float32, já sem nulos) e target
+X = pd.DataFrame(features.matriz(df), columns=features.FEATURES)
 y = df['rele_state']
+# Exemplos reforçados são gravados uma vez com peso > 1 (ver simular_dados.py)
+peso = df['peso'].to_numpy(dtype=float)
 
 # Treinamento do modelo
-tscv = TimeSeriesSplit(n_splits=3)
-model = HistGradientBoostingClassifier()
-grid = GridSearchCV(model, {"learning_rate": [0.01, 0.1]}, cv=tscv)
-grid.fit(X, y)
-joblib.dump(grid.best_estimator_, MODEL_FILE)
-print(f"Modelo salvo como {MODEL_FILE}. Target = relé.")
+# O peso vai para o fit e também para o score da validação cruzada (metadata routing),
+# para o cv_score contar cada leitura reforçada como as cópias que ela substitui
+sklearn.set_config(enable_metadata_routing=True)
+tscv = TimeSeriesSplit(n_splits=CV_SPLITS)
+model = HistGradientBoostingClassifier().set_fit_request(sample_weight=True)
+acuracia = make_scorer(accuracy_score).set_score_request(sample_weight=True)
+grid = GridSearchCV(model, {"learning_rate": [0.01, 0.1]}, cv=tscv, scoring=acuracia)
+t0 = time.perf_counter()
+grid.fit(X, y, sample_weight=peso)
+tempo_fit = time.perf_counter() - t0
+best = grid.best_estimator_
+
+# Exporta as árvores para o avaliador compilado (somente NumPy) e confere
+# que as predições são idênticas às do sklearn em todo o conjunto de treino
+with tempfile.TemporaryDirectory() as tmp:
+    compilado = ModeloCompilado.carrega(exporta_modelo(best, os.path.join(tmp, 'model.npz')))
+pred_sklearn = best.predict(X)
+divergentes = int((pred_sklearn != compilado.predict(X)).sum())
+amostra = X.to_numpy()[:1000]
+divergentes += sum(compilado.predict_one(linha) != p for linha, p in zip(amostra, pred_sklearn[:1000]))
+if divergentes:
+    raise SystemExit(f"Modelo compilado diverge do sklearn em {divergentes} predições!")
+
+
+def mede(fn, repeticoes):
+    t0 = time.perf_counter()
+    for _ in range(repeticoes):
+        fn()
+    return (time.perf_counter() - t0) / repeticoes
+
+
+# Latências em µs por linha, para comparar o custo entre versões
+linha_df = X.iloc[[0]]
+latencia = {
+    'sklearn_linha_us': mede(lambda: best.predict(linha_df), 50) * 1e6,
+    'sklearn_lote_us': mede(lambda: best.predict(X), 3) / len(X) * 1e6,
+    'compilado_linha_us': mede(lambda: [compilado.predict_one(linha) for linha in amostra], 3) / len(amostra) * 1e6,
+    'compilado_lote_us': mede(lambda: compilado.predict(X), 3) / len(X) * 1e6,
+}
+
+versao = registro_modelos.registra(best, {
+    'dados': {
+        'linhas': int(len(df)),
+        'peso_total': float(peso.sum()),
+        'id_medida_min': int(df['id_medida'].min()),
+        'id_medida_max': int(df['id_medida'].max()),
+        'data_hora_min': str(banco.ms_para_datetime(df['data_hora_ms']).min()),
+        'data_hora_max': str(banco.ms_para_datetime(df['data_hora_ms']).max()),
+    },
+    'features': list(X.columns),
+    'schema_hash': registro_modelos.schema_hash(zip(X.columns, X.dtypes)),
+    'target': 'rele_state',
+    'parametros': {k: v for k, v in best.get_params().items() if isinstance(v, (int, float, str, bool, type(None)))},
+    'busca': {'grid': {"learning_rate": [0.01, 0.1]}, 'cv': f'TimeSeriesSplit(n_splits={CV_SPLITS})',
+              'scoring': 'accuracy ponderada por peso'},
+    'n_iter': int(best.n_iter_),
+    'cv_score': float(grid.best_score_),
+    'tempo_fit_s': round(tempo_fit, 3),
+    'latencia': {k: round(v, 3) for k, v in latencia.items()},
+    'sklearn': sklearn.__version__,
+    'python': sys.version.split()[0],
+}, exporta_compilado=exporta_modelo)
+print(f"Modelo registrado como {versao} em {registro_modelos.REGISTRY_DIR} (cv_score={grid.best_score_:.4f}). Target = relé.")
+print(f"Compilado idêntico ao sklearn em {len(X)} linhas. Latência: "
+      f"{latencia['compilado_linha_us']:.1f} µs/linha, {latencia['compilado_lote_us']:.2f} µs/linha em lote "
+      f"(sklearn: {latencia['sklearn_linha_us']:.0f} µs/linha, {latencia['sklearn_lote_us']:.2f} µs/linha em lote).")
+if args.no_promote:
+    pass
+elif args.min_score is None:
+    registro_modelos.promove(versao)
+    print(f"Versão ativa: {versao}")
+else:
+    promover, motivo = registro_modelos.avalia_promocao(versao, args.min_score, args.custo, args.tolerancia)
+    if promover:
+        registro_modelos.promove(versao)
+        print(f"Versão ativa: {versao} ({motivo})")
+    else:
+        print(f"{versao} registrada sem promover: {motivo}. Versão ativa: {registro_modelos.versao_ativa()}")
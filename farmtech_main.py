@@ -7,15 +7,15 @@ Version: 1.5
 Date: 2025-06-20
 
 Menu interativo: Treina ML, coleta dados em background, faz tail dos logs, tail do serial Wokwi, inicia dashboard Streamlit.
+Com --supervisor roda sem menu, supervisionando os processos de supervisor.json (ver farmtech_supervisor.py).
 """
 
 import subprocess
 import os
 import sys
-import time
-from datetime import datetime
 
 BACKEND_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), 'backend'))
+COLETA_LOG = os.path.join(BACKEND_PATH, 'logs', 'coleta.log')
 WOKWI_TOML = os.path.join(os.path.dirname(__file__), 'wokwi.toml')
 coleta_proc = None
 log_file = None
@@ -26,13 +26,12 @@ def start_script(script_name, streamlit=False, log_to_file=False):
         print(f"Iniciando dashboard Streamlit: {script_path}")
         return subprocess.Popen(['streamlit', 'run', script_path], cwd=BACKEND_PATH)
     elif log_to_file:
-        now = datetime.now().strftime("%Y%m%d_%H%M%S")
-        log_file = os.path.join(BACKEND_PATH, f"coleta_log_{now}.txt")
-        os.makedirs(BACKEND_PATH, exist_ok=True)
-        print(f"Iniciando coleta de dados, logs em: {log_file}")
-        f = open(log_file, "w")
-        proc = subprocess.Popen([sys.executable, '-u', script_path], stdout=f, stderr=subprocess.STDOUT, cwd=BACKEND_PATH)
-        return proc, log_file
+        # O próprio coletor grava o log (em lotes, rotacionado e comprimido);
+        # no terminal do menu só aparecem erros (stderr)
+        print(f"Iniciando coleta de dados, logs em: {COLETA_LOG}")
+        proc = subprocess.Popen([sys.executable, script_path, '--log-file', COLETA_LOG],
+                                stdout=subprocess.DEVNULL, cwd=BACKEND_PATH)
+        return proc, COLETA_LOG
     else:
         print(f"Executando script: {script_path}")
         return subprocess.Popen([sys.executable, script_path], cwd=BACKEND_PATH)
@@ -51,25 +50,12 @@ def menu():
     print("="*60)
 
 def tail_file(file_path, n=20):
+    sys.path.insert(0, BACKEND_PATH)
+    import farmtech_logs
     try:
         print(f"\n---- Mostrando últimas linhas de {file_path} ----")
-        with open(file_path, 'r') as f:
-            # Move para o final do arquivo
-            f.seek(0, os.SEEK_END)
-            size = f.tell()
-            f.seek(max(size-4096, 0), os.SEEK_SET)
-            lines = f.readlines()[-n:]
-            for line in lines:
-                print(line, end='')
         print("---- Pressione Ctrl+C para sair do tail ----\n")
-        with open(file_path, 'r') as f:
-            f.seek(0, os.SEEK_END)
-            while True:
-                line = f.readline()
-                if line:
-                    print(line, end='')
-                else:
-                    time.sleep(0.5)
+        farmtech_logs.segue(file_path, n)
     except KeyboardInterrupt:
         print("\n(Tail encerrado pelo usuário)")
     except Exception as e:
@@ -123,8 +109,9 @@ def main():
             else:
                 print("Nenhuma coleta de dados em execução.")
         elif escolha == "4":
-            if log_file and os.path.exists(log_file):
-                tail_file(log_file)
+            arquivo = log_file or COLETA_LOG
+            if os.path.exists(arquivo):
+                tail_file(arquivo)
             else:
                 print("Nenhum log de coleta encontrado ou coleta ainda não iniciada.")
         elif escolha == "5":
@@ -151,4 +138,14 @@ def main():
             print("Opção inválida. Escolha entre 1 e 7.")
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    parser = argparse.ArgumentParser(description="FarmTech Solutions – menu interativo ou supervisor headless.")
+    parser.add_argument('--supervisor', action='store_true',
+                        help='Modo não interativo: supervisiona os processos de supervisor.json')
+    parser.add_argument('--config', type=str, default=None, help='Configuração do supervisor (JSON)')
+    args = parser.parse_args()
+    if args.supervisor:
+        import farmtech_supervisor
+        farmtech_supervisor.supervisiona(args.config or farmtech_supervisor.CONFIG_FILE)
+    else:
+        main()
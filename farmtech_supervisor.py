@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+farmtech_supervisor.py
+Author: Mário (DevOps/SRE)
+Version: 1.0
+Date: 2026-10-19
+
+Supervisor não interativo (headless) para rodar o FarmTech sem operador no gateway.
+- Inicia os coletores, dashboards, serviços e jobs agendados descritos em supervisor.json
+- Reinicia filhos que caem, com backoff exponencial
+- SIGTERM/SIGINT (ou erro no próprio supervisor): encerra os filhos com SIGTERM e, após o prazo, SIGKILL
+- Falha ao iniciar um filho (ex.: executável fora do PATH) é tratada como queda, com backoff
+- Imprime periodicamente uma tabela de status: PID, uptime, reinícios e linhas/s por coletor
+- Saída bruta de cada filho em backend/logs/<nome>.out, rotacionada por tamanho e comprimida
+
+Uso:
+    ./farmtech_supervisor.py [--config supervisor.json]
+    ./farmtech_main.py --supervisor [--config supervisor.json]
+
+Licença: MIT
+"""
+
+import argparse
+import json
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import time
+
+BASE_PATH = os.path.abspath(os.path.dirname(__file__))
+BACKEND_PATH = os.path.join(BASE_PATH, 'backend')
+CONFIG_FILE = os.path.join(BASE_PATH, 'supervisor.json')
+DB_FILE = os.path.join(BASE_PATH, 'farm_data.db')
+LOG_DIR = os.path.join(BACKEND_PATH, 'logs')
+
+sys.path.insert(0, BACKEND_PATH)
+import farmtech_logs  # noqa: E402
+
+BACKOFF_INICIAL_S = 1.0
+BACKOFF_MAX_S = 60.0
+ESTAVEL_S = 30.0        # rodou mais que isso: o backoff volta ao inicial
+PRAZO_ENCERRAMENTO_S = 10.0
+TIPOS = ('coletor', 'dashboard', 'servico', 'job')
+
+
+def _duracao(segundos):
+    segundos = int(segundos)
+    h, resto = divmod(segundos, 3600)
+    m, s = divmod(resto, 60)
+    return f"{h}h{m:02d}m{s:02d}s" if h else f"{m}m{s:02d}s"
+
+
+class Processo:
+    """Um filho supervisionado: serviço (coletor/dashboard/servico) ou job agendado."""
+
+    def __init__(self, cfg):
+        self.nome = cfg['nome']
+        self.tipo = cfg.get('tipo', 'job')
+        if self.tipo not in TIPOS:
+            raise ValueError(f"{self.nome}: tipo inválido '{self.tipo}' (use {', '.join(TIPOS)})")
+        script = os.path.join(BACKEND_PATH, cfg['script'])
+        if cfg.get('streamlit'):
+            self.comando = ['streamlit', 'run', script, '--server.headless', 'true', *cfg.get('args', [])]
+        else:
+            self.comando = [sys.executable, '-u', script, *cfg.get('args', [])]
+        self.intervalo_s = cfg.get('intervalo_s')
+        if self.tipo == 'job' and not self.intervalo_s:
+            raise ValueError(f"{self.nome}: jobs precisam de intervalo_s")
+        self.id_dispositivo = cfg.get('id_dispositivo')
+        # Saída bruta do filho (stdout/stderr), rotacionada como os logs; coletores gravam
+        # também o próprio log com --log-file (ver farmtech_logs.py)
+        self.log_path = os.path.join(LOG_DIR, f"{self.nome}.out")
+        self.proc = None
+        self.log = None
+        self.inicio = None
+        self.reinicios = 0
+        self.ultimo_codigo = None
+        self.erro = None
+        self.backoff = BACKOFF_INICIAL_S
+        self.proximo_inicio = time.monotonic() if not cfg.get('atraso_inicial_s') \
+            else time.monotonic() + cfg['atraso_inicial_s']
+        self.linhas_s = None
+
+    @property
+    def rodando(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def inicia(self):
+        try:
+            # Nova sessão: Ctrl+C no terminal chega só ao supervisor, que encerra os filhos em ordem
+            self.proc = subprocess.Popen(self.comando, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                         cwd=BACKEND_PATH, start_new_session=True)
+        except OSError as e:
+            # Ex.: streamlit fora do PATH; conta como falha de início, com backoff
+            self.erro = f"falha ao iniciar: {e}"
+            espera = self._agenda_reinicio(time.monotonic())
+            print(f"[supervisor] {self.nome}: {self.erro}; nova tentativa em {espera:.0f}s", flush=True)
+            return
+        self.log = farmtech_logs.CopiaSaida(self.proc.stdout, self.log_path)
+        self.log.start()
+        self.erro = None
+        self.inicio = time.monotonic()
+        print(f"[supervisor] {self.nome}: iniciado (PID {self.proc.pid}), log em {self.log_path}", flush=True)
+
+    def verifica(self, agora):
+        """Trata o término do filho e decide quando iniciá-lo de novo."""
+        if self.proc is not None and self.proc.poll() is not None:
+            self.ultimo_codigo = self.proc.returncode
+            duracao = agora - self.inicio
+            self.proc = None
+            self.log.join(timeout=1)  # resto do pipe, antes que uma nova cópia abra o mesmo arquivo
+            if self.tipo == 'job' and self.ultimo_codigo == 0:
+                self.backoff = BACKOFF_INICIAL_S
+                self.proximo_inicio = self.inicio + self.intervalo_s
+                print(f"[supervisor] {self.nome}: concluído em {_duracao(duracao)}", flush=True)
+            else:
+                if duracao >= ESTAVEL_S:
+                    self.backoff = BACKOFF_INICIAL_S
+                espera = self._agenda_reinicio(agora)
+                print(f"[supervisor] {self.nome}: terminou com código {self.ultimo_codigo} após "
+                      f"{_duracao(duracao)}; reinício em {espera:.0f}s", flush=True)
+        if self.proc is None and agora >= self.proximo_inicio:
+            if self.inicio is not None and self.tipo != 'job':
+                self.reinicios += 1
+            self.inicia()
+
+    def _agenda_reinicio(self, agora):
+        """Próxima tentativa após o backoff atual (jobs: no máximo o intervalo); dobra o backoff."""
+        espera = self.backoff if self.tipo != 'job' else min(self.backoff, self.intervalo_s)
+        self.backoff = min(self.backoff * 2, BACKOFF_MAX_S)
+        self.proximo_inicio = agora + espera
+        return espera
+
+    def encerra(self):
+        if self.rodando:
+            self.proc.terminate()
+
+    def mata(self):
+        if self.rodando:
+            self.proc.kill()
+
+
+def _linhas_por_segundo(processos, janela_ms):
+    """Taxa de inserção de cada coletor, contada em MedidaSolo (índice em data_hora_ms)."""
+    coletores = [p for p in processos if p.tipo == 'coletor' and p.id_dispositivo is not None]
+    if not coletores or not os.path.exists(DB_FILE):
+        return
+    desde = time.time_ns() // 1_000_000 - janela_ms
+    try:
+        conn = sqlite3.connect(f"file:{DB_FILE}?mode=ro", uri=True, timeout=1)
+        try:
+            contagens = dict(conn.execute(
+                "SELECT id_dispositivo, COUNT(*) FROM MedidaSolo WHERE data_hora_ms >= ? GROUP BY id_dispositivo",
+                (desde,)).fetchall())
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return
+    for p in coletores:
+        p.linhas_s = contagens.get(p.id_dispositivo, 0) / (janela_ms / 1000)
+
+
+def imprime_status(processos):
+    agora = time.monotonic()
+    if sys.stdout.isatty():
+        print("\033[2J\033[H", end='')
+    print(f"FarmTech Supervisor – {time.strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"{'NOME':<14}{'TIPO':<10}{'ESTADO':<10}{'PID':>8}{'UPTIME':>12}{'REINÍCIOS':>11}{'LINHAS/S':>10}  OBS")
+    for p in processos:
+        if p.rodando:
+            estado, pid, uptime = 'rodando', str(p.proc.pid), _duracao(agora - p.inicio)
+        else:
+            estado, pid, uptime = ('agendado' if p.tipo == 'job' else 'parado'), '-', '-'
+        taxa = f"{p.linhas_s:.2f}" if p.linhas_s is not None else '-'
+        obs = []
+        if p.ultimo_codigo is not None:
+            obs.append(f"último código {p.ultimo_codigo}")
+        if p.erro:
+            obs.append(p.erro)
+        if not p.rodando:
+            obs.append(f"próximo em {_duracao(max(0, p.proximo_inicio - agora))}")
+        print(f"{p.nome:<14}{p.tipo:<10}{estado:<10}{pid:>8}{uptime:>12}{p.reinicios:>11}{taxa:>10}  {', '.join(obs)}")
+    sys.stdout.flush()
+
+
+def carrega_config(caminho):
+    with open(caminho) as f:
+        cfg = json.load(f)
+    processos = [Processo(p) for p in cfg['processos'] if p.get('ativo', True)]
+    nomes = [p.nome for p in processos]
+    if len(set(nomes)) != len(nomes):
+        raise ValueError("Nomes de processos duplicados em " + caminho)
+    return processos, cfg.get('status_intervalo_s', 5)
+
+
+def supervisiona(config=CONFIG_FILE):
+    processos, status_intervalo_s = carrega_config(config)
+    parar = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: parar.append(signum))
+    signal.signal(signal.SIGINT, lambda signum, frame: parar.append(signum))
+    print(f"[supervisor] PID {os.getpid()}, {len(processos)} processos de {config}", flush=True)
+
+    proximo_status = time.monotonic()
+    try:
+        while not parar:
+            agora = time.monotonic()
+            for p in processos:
+                p.verifica(agora)
+            if agora >= proximo_status:
+                _linhas_por_segundo(processos, status_intervalo_s * 1000)
+                imprime_status(processos)
+                proximo_status = agora + status_intervalo_s
+            time.sleep(0.2)
+        print(f"\n[supervisor] sinal {parar[0]} recebido, encerrando filhos...", flush=True)
+    finally:
+        # Também em erro inesperado: os filhos estão em outra sessão e ficariam órfãos
+        encerra_filhos(processos)
+
+
+def encerra_filhos(processos):
+    """SIGTERM em todos os filhos e, após PRAZO_ENCERRAMENTO_S, SIGKILL nos que restarem."""
+    for p in processos:
+        p.encerra()
+    limite = time.monotonic() + PRAZO_ENCERRAMENTO_S
+    while any(p.rodando for p in processos) and time.monotonic() < limite:
+        time.sleep(0.1)
+    for p in processos:
+        if p.rodando:
+            print(f"[supervisor] {p.nome}: não encerrou em {PRAZO_ENCERRAMENTO_S:.0f}s, SIGKILL", flush=True)
+            p.mata()
+            p.proc.wait()
+        if p.log is not None:
+            p.log.join(timeout=1)
+    print("[supervisor] encerrado.", flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Supervisor headless do FarmTech.")
+    parser.add_argument('--config', type=str, default=CONFIG_FILE, help='Arquivo JSON com os processos')
+    args = parser.parse_args()
+    supervisiona(args.config)
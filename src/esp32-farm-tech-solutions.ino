@@ -17,9 +17,21 @@ LiquidCrystal_I2C lcd(LCD_ADDR, 16, 2);  // 16×2 LCD over I²C :contentReferenc
 
 #define DHTTYPE DHT22
 
+// Telemetria: 1 = quadro binário de 13 bytes com CRC (coletor com --binario),
+// 0 = linha de texto legível (Serial Monitor/Plotter; coletor padrão)
+#define MODO_BINARIO       0
+#define ID_DISPOSITIVO     1
+
+// Quadro binário (little-endian), ver backend/telemetria_binaria.py
+#define QUADRO_SYNC        0xA5
+#define QUADRO_VERSAO      1
+#define QUADRO_TAMANHO     13
+#define QUADRO_INVALIDO    0xFFFF
+
 DHTesp dht;
 bool sensorFosforo = false;
 bool sensorPotassio = false;
+uint16_t seqQuadro = 0;
 
 // Simulate pH from LDR reading
 float simularPH(int valorLDR) {
@@ -28,6 +40,41 @@ float simularPH(int valorLDR) {
   return phMin + ((phMax - phMin) * (4095 - valorLDR) / 4095.0);
 }
 
+// CRC-16/CCITT-FALSE (poli 0x1021, início 0xFFFF), igual a binascii.crc_hqx no coletor
+uint16_t crc16(const uint8_t *dados, size_t n) {
+  uint16_t crc = 0xFFFF;
+  for (size_t i = 0; i < n; i++) {
+    crc ^= (uint16_t)dados[i] << 8;
+    for (int b = 0; b < 8; b++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+// Valor em centésimos; NaN/fora da faixa vira QUADRO_INVALIDO
+uint16_t centesimos(float valor) {
+  if (isnan(valor) || valor < 0 || valor >= QUADRO_INVALIDO / 100.0) return QUADRO_INVALIDO;
+  return (uint16_t)(valor * 100 + 0.5);
+}
+
+void enviarQuadro(float umidade, float valorpH, bool rele) {
+  uint8_t q[QUADRO_TAMANHO];
+  uint16_t u = centesimos(umidade);
+  uint16_t p = centesimos(valorpH);
+  q[0] = QUADRO_SYNC;
+  q[1] = QUADRO_VERSAO;
+  q[2] = ID_DISPOSITIVO & 0xFF;  q[3] = ID_DISPOSITIVO >> 8;
+  q[4] = seqQuadro & 0xFF;       q[5] = seqQuadro >> 8;
+  q[6] = u & 0xFF;               q[7] = u >> 8;
+  q[8] = p & 0xFF;               q[9] = p >> 8;
+  q[10] = (sensorFosforo ? 0x01 : 0) | (sensorPotassio ? 0x02 : 0) | (rele ? 0x04 : 0);
+  uint16_t crc = crc16(q, 11);
+  q[11] = crc & 0xFF;            q[12] = crc >> 8;
+  Serial.write(q, QUADRO_TAMANHO);
+  seqQuadro++;
+}
+
 void setup() {
   Serial.begin(115200);
 
@@ -50,13 +97,13 @@ void loop() {
   // Toggle phosphorus sensor state on button press
   if (digitalRead(PIN_SENSOR_FOSFORO) == LOW) {
     sensorFosforo = !sensorFosforo;
-    Serial.print("Fósforo: "); Serial.println(sensorFosforo);
+    if (!MODO_BINARIO) { Serial.print("Fósforo: "); Serial.println(sensorFosforo); }
     delay(500);  // debounce
   }
   // Toggle potassium sensor state on button press
   if (digitalRead(PIN_SENSOR_POTASSIO) == LOW) {
     sensorPotassio = !sensorPotassio;
-    Serial.print("Potássio: "); Serial.println(sensorPotassio);
+    if (!MODO_BINARIO) { Serial.print("Potássio: "); Serial.println(sensorPotassio); }
     delay(500);  // debounce
   }
 
@@ -75,12 +122,16 @@ void loop() {
 
   digitalWrite(PIN_RELE, ligarRele ? HIGH : LOW);
 
-  // Serial debug for Plotter 
-  Serial.print("Fósforo: ");    Serial.print(sensorFosforo);
-  Serial.print(" | Potássio: ");Serial.print(sensorPotassio);
-  Serial.print(" | Umidade: ");  Serial.print(umidade);
-  Serial.print(" | pH (sim): "); Serial.print(valorpH);
-  Serial.print(" | Relé: ");     Serial.println(ligarRele ? "LIGADO" : "DESLIGADO");
+  if (MODO_BINARIO) {
+    enviarQuadro(umidade, valorpH, ligarRele);
+  } else {
+    // Serial debug for Plotter 
+    Serial.print("Fósforo: ");    Serial.print(sensorFosforo);
+    Serial.print(" | Potássio: ");Serial.print(sensorPotassio);
+    Serial.print(" | Umidade: ");  Serial.print(umidade);
+    Serial.print(" | pH (sim): "); Serial.print(valorpH);
+    Serial.print(" | Relé: ");     Serial.println(ligarRele ? "LIGADO" : "DESLIGADO");
+  }
 
   // Update LCD display :contentReference[oaicite:8]{index=8}
   lcd.clear();